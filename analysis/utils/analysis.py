@@ -1,15 +1,225 @@
 from collections import defaultdict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
 from os import times
+import functools
+import glob
+import gzip
+import inspect
+import io
+import json
+import mmap
+import os
+import re
+import shutil
+import struct
+import statistics
 import sys
+import tempfile
+import time
+import zipfile
+import zlib
 import numpy
 import math
-from typing import Tuple
+from typing import List, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    # Only needed for .zst logs
+    zstandard = None
+
+# Action codes used by the columnar (numpy) log engine
+ACTION_PUB = 0
+ACTION_RECV = 1
+ACTION_INTEREST = 2
+
+# Sync interest types used by the columnar (numpy) log engine. -1 means the
+# event is not an INTEREST.
+INTEREST_PUBLISH = 0
+INTEREST_SUPPRESSION = 1
+INTEREST_PERIODIC = 2
+
+# The first bytes of every kind of record in a simulator log. Trailer records
+# start the line; the action is the third field of an event line, and the sync
+# interest type the fourth.
+TRAILER_PREFIXES = {
+    'SYNC_PACK': b'SYNC_PACK=',
+    'SYNC_BYTE': b'SYNC_BYTE=',
+    'MTU_SIZE': b'MTU_SIZE=',
+}
+ACTION_PREFIXES = {
+    ACTION_PUB: b'PUB,',
+    ACTION_RECV: b'RECV,',
+    ACTION_INTEREST: b'INTEREST,',
+}
+INTEREST_TYPE_NAMES = {
+    INTEREST_PUBLISH: b'PUBLISH',
+    INTEREST_SUPPRESSION: b'SUPPRESSION',
+    INTEREST_PERIODIC: b'PERIODIC',
+}
+INTEREST_TYPES = {name.decode(): interest_type for interest_type, name in INTEREST_TYPE_NAMES.items()}
+
+# Kinds of the diagnostic lines that core.cpp prints in debug builds, in
+# between the events:
+#   (Entering suppression state)
+#   /<node>,Found outdated entry /<data_node>::<seq> but ignoring since within network RTT (<delta> ms out of date)
+#   /<node>,Found outdated entry /<data_node>::<seq> older than RTT (<delta> ms out of date)
+DIAGNOSTIC_SUPPRESSION = 0
+DIAGNOSTIC_OUTDATED_IGNORED = 1
+DIAGNOSTIC_OUTDATED_ACCEPTED = 2
+DIAGNOSTIC_SUPPRESSION_LINE = b'(Entering suppression state)'
+# What follows the first comma of an outdated entry line
+DIAGNOSTIC_OUTDATED_PREFIX = b'Found outdated entry '
+# What follows the sequence number, telling whether it was within the RTT
+DIAGNOSTIC_OUTDATED_REASONS = {
+    DIAGNOSTIC_OUTDATED_IGNORED: b' but ignoring since within network RTT (',
+    DIAGNOSTIC_OUTDATED_ACCEPTED: b' older than RTT (',
+}
+DIAGNOSTIC_OUTDATED_SUFFIX = b' ms out of date)'
+
+# Derived artifacts of a log (e.g. the columnar event sidecar) are stored in
+# this hidden directory next to it. Bump the version whenever the layout of a
+# sidecar changes so that stale ones get rebuilt.
+SIDECAR_DIRNAME = '.logcache'
+SIDECAR_VERSION = 2
+EVENT_SIDECAR_SUFFIX = '.events.npz'
+TIME_INDEX_SUFFIX = '.tindex.npz'
+LATENCY_HISTOGRAM_SUFFIX = '.latency.npz'
+# Number of events between two entries of the sparse time index
+TIME_INDEX_STRIDE = 1024
+
+# Logs can be stored compressed; the suffix of the file says how
+LOG_COMPRESSION_SUFFIXES = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+# Fast levels: the simulator writes a log at a few MB/s at most, and these
+# still shrink the logs about tenfold
+LOG_COMPRESSION_LEVELS = {
+    'gzip': 1,
+    'zstd': 3,
+}
+
+# How much of a compressed log _read_truncated_log_bytes decompresses at a
+# time. Everything before a cut off chunk is kept
+TRUNCATED_READ_CHUNK_BYTES = 1024 * 1024
+
+# The fields of the log names written by gen_exp.py, e.g. '4_Row' or
+# '0.5_DROP_RATE': {suffix: (parameter, type)}
+LEGACY_LOG_PARAMETERS = {
+    '_Method': ('method', str),
+    '_Row': ('rows', int),
+    '_Col': ('cols', int),
+    '_MS_INTER_SLOW': ('inter_slow_ms', int),
+    '_MS_INTER_FAST': ('inter_fast_ms', int),
+    '_Nodes_Pub_Fast': ('fast_publishers', int),
+    '_RECENT_PUB': ('recent_to_include', int),
+    '_RANDOM_PUB': ('random_to_include', int),
+    '_S_STOP': ('stop_s', int),
+    '_DROP_RATE': ('drop_rate', float),
+    '_MTU': ('mtu', int),
+}
+
+# The logs in results/ are just named after their number of random publishers
+# to include (10rand, 36rand, ...), next to analyze.py and result.txt
+LEGACY_RESULTS_LOG_NAME = re.compile(r'(\d+)rand')
+
+# What read_legacy_logs looks for by default: both kinds of names
+LEGACY_LOG_PATTERNS = ('*.log', '*rand')
+
+# Timestamps are printed in milliseconds with six decimal places, i.e. at
+# nanosecond resolution, so we store them as fixed-point int64 nanoseconds.
+TIMESTAMP_DECIMALS = 6
+
+# The numpy parser works on this many fields (and buffer bytes) at a time, so
+# that its temporary arrays stay small next to the tables it builds
+PARSE_BATCH_ROWS = 16384
+PARSE_BATCH_BYTES = 1024 * 1024
+
+# Constants of the splitmix64 mixing function, used to decide which messages
+# a preview samples
+SPLITMIX64_GAMMA = 0x9E3779B97F4A7C15
+SPLITMIX64_MULTIPLIERS = (0xBF58476D1CE4E5B9, 0x94D049BB133111EB)
+UINT64_MASK = 0xFFFFFFFFFFFFFFFF
+
+def message_sampled(publisher: str, seq: int, fraction) -> bool:
+    """
+    Whether a preview that samples `fraction` of the messages includes the
+    message publisher::seq. The choice only depends on the message, so every
+    run, engine and RECV of the message agrees on it.
+    """
+    z = (((zlib.crc32(publisher.encode()) << 32) | seq) + SPLITMIX64_GAMMA) & UINT64_MASK
+    z = ((z ^ (z >> 30)) * SPLITMIX64_MULTIPLIERS[0]) & UINT64_MASK
+    z = ((z ^ (z >> 27)) * SPLITMIX64_MULTIPLIERS[1]) & UINT64_MASK
+    z ^= z >> 31
+    return (z >> 11) < int(fraction * 2 ** 53)
+
+
+def _sampled_messages(node_names, publisher: numpy.ndarray, seq: numpy.ndarray, fraction) -> numpy.ndarray:
+    """
+    message_sampled for arrays of node IDs and sequence numbers.
+    """
+    name_hashes = numpy.array([zlib.crc32(name.encode()) for name in node_names] or [0], dtype=numpy.uint64)
+    z = (name_hashes[publisher] << numpy.uint64(32)) | seq.astype(numpy.uint64)
+    z = z + numpy.uint64(SPLITMIX64_GAMMA)
+    z = (z ^ (z >> numpy.uint64(30))) * numpy.uint64(SPLITMIX64_MULTIPLIERS[0])
+    z = (z ^ (z >> numpy.uint64(27))) * numpy.uint64(SPLITMIX64_MULTIPLIERS[1])
+    z ^= z >> numpy.uint64(31)
+    return (z >> numpy.uint64(11)) < numpy.uint64(int(fraction * 2 ** 53))
+
+
+def _cache_key(value):
+    """
+    A hashable stand-in for an argument of a memoized method: lists, tuples
+    and arrays become tuples of their items.
+    """
+    if isinstance(value, numpy.ndarray):
+        return tuple(value.tolist())
+    if isinstance(value, (list, tuple)):
+        return tuple(_cache_key(item) for item in value)
+    return value
+
+
+def _memoized(method):
+    """
+    Decorator for LogData methods that derive a metric from its data. The
+    result is computed once per set of arguments and kept until one of the
+    data attributes of the LogData is assigned a new value. Arguments are
+    matched by value whether they are passed by position or keyword; calls
+    with arguments that can't be hashed are simply not cached.
+    """
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        key = (method.__name__, tuple(_cache_key(value) for value in list(bound.arguments.values())[1:]))
+        try:
+            hash(key)
+        except TypeError:
+            return method(self, *args, **kwargs)
+        if key not in self._derived:
+            self._derived[key] = method(self, *args, **kwargs)
+        return self._derived[key]
+    return wrapper
 
 
 class LogData:
+    # Assigning any of these clears the derived metrics cache (see _memoized).
+    # Mutating them in place doesn't, so don't do that after using a metric.
+    DATA_FIELDS = frozenset([
+        'nodes', 'messages', 'publish_times', 'receive_times', 'latencies',
+        'end_time', 'sync_pack', 'sync_bytes', 'mtu_size', 'num_publish_interests',
+        'num_suppression_interests', 'num_periodic_interests', 'recv_table',
+        'latency_sketch', 'sample_fraction', 'interest_table', 'num_received_messages',
+    ])
+
     def __init__(self, nodes, messages, publish_times, receive_times, latencies,
                  end_time, sync_pack, sync_bytes, mtu_size, num_publish_interests,
                  num_suppression_interests, num_periodic_interests):
+        self._derived = {}
         self.nodes = nodes
         self.messages = messages
         self.publish_times = publish_times
@@ -22,17 +232,370 @@ class LogData:
         self.num_publish_interests = num_publish_interests
         self.num_suppression_interests = num_suppression_interests
         self.num_periodic_interests = num_periodic_interests
-        self._90th_percentile_latency_value = None
+        # Only set for compact LogData, see from_recv_table
+        self.recv_table = None
+        # Only set when reading with a latency sketch, see read_log_file
+        self.latency_sketch = None
+        # The number of distinct messages received, when `latencies` doesn't
+        # have them (the python engine with a latency sketch)
+        self.num_received_messages = None
+        # Every sync interest, see interest_time_series
+        self.interest_table = None
+        # Where to read interest_table from when it is first needed, for the
+        # line-by-line parsers: the arguments of _read_interest_table
+        self.interest_source = None
+        # The fraction of the messages whose latencies were kept; less than 1
+        # for a preview, see read_log_file
+        self.sample_fraction = 1
+
+    @classmethod
+    def from_recv_table(cls, nodes, messages, publish_times, recv_table, end_time,
+                        sync_pack, sync_bytes, mtu_size, num_publish_interests,
+                        num_suppression_interests, num_periodic_interests) -> 'LogData':
+        """
+        Build a compact LogData that keeps its RECV events in a RecvTable
+        instead of nested dicts. `receive_times` and `latencies` are then
+        read-only views of the table.
+        """
+        log_data = cls(nodes, messages, publish_times, _ReceiveTimesView(recv_table),
+                       _LatencyView(recv_table), end_time, sync_pack, sync_bytes,
+                       mtu_size, num_publish_interests, num_suppression_interests,
+                       num_periodic_interests)
+        log_data.recv_table = recv_table
+        return log_data
+
+    def __setattr__(self, name, value):
+        # Only a new value for data that was already set makes the cached
+        # metrics stale; the first assignment (or a LazyLogData tier being
+        # loaded) doesn't
+        if name in LogData.DATA_FIELDS and name in self.__dict__:
+            self._derived.clear()
+        super().__setattr__(name, value)
 
+    @_memoized
     def _get_message_latency_percentiles(self, message: Tuple[str, int]) -> Tuple[float, float]:
         """
         Returns the 50th and 90th percentile latencies for a given message
         """
+        percentile50, percentile90 = numpy.percentile(self.latencies[message], [50, 90])
+        return percentile50, percentile90
+
+    def _sorted_latency_segments(self) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """
+        All the latencies in one flat array, grouped by message (in the same
+        order as iterating over self.latencies) and sorted within each group.
+        Returns the array along with the start and length of every group.
+        """
+        if self.recv_table is None and self.latency_sketch is not None:
+            raise Exception('Per-message latencies need the receive times, read the log without a latency sketch')
+        if self.recv_table is not None:
+            keys = self.recv_table.message_keys()
+            values = self.recv_table.latencies()
+            _, first, inverse = numpy.unique(keys, return_index=True, return_inverse=True)
+            # Number the messages in the order they were first received
+            rank = numpy.empty(len(first), dtype=numpy.int64)
+            rank[numpy.argsort(first, kind='stable')] = numpy.arange(len(first))
+            segment = rank[inverse.ravel()]
+        else:
+            lengths = numpy.fromiter((len(latencies) for latencies in self.latencies.values()),
+                                     dtype=numpy.int64, count=len(self.latencies))
+            values = numpy.fromiter((latency for latencies in self.latencies.values() for latency in latencies),
+                                    dtype=numpy.float64, count=int(lengths.sum()))
+            segment = numpy.repeat(numpy.arange(len(lengths)), lengths)
+        order = numpy.lexsort((values, segment))
+        counts = numpy.bincount(segment, minlength=len(self.latencies))
+        starts = numpy.cumsum(counts) - counts
+        return values[order], starts, counts
+
+    @_memoized
+    def message_latency_percentiles(self) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """
+        The 50th percentile, 90th percentile and maximum latency of every
+        message, in the same order as iterating over self.latencies. This is
+        the same as calling numpy.percentile and max on every message, down to
+        the last bit, but done for all the messages at once.
+        """
+        values, starts, counts = self._sorted_latency_segments()
+        if numpy.any(counts == 0):
+            raise ValueError('Cannot take the percentiles of a message without latencies')
         return (
-            numpy.percentile(self.latencies[message], 50),
-            numpy.percentile(self.latencies[message], 90)
+            _segment_percentiles(values, starts, counts, 50),
+            _segment_percentiles(values, starts, counts, 90),
+            values[starts + counts - 1] if len(counts) else numpy.zeros(0)
         )
 
+    def _dissemination_segments(self) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """
+        Like _sorted_latency_segments, but with a group for every published
+        message (see _published_messages), including the ones no
+        node received, and with only the first RECV of a message by a node.
+        """
+        names, ids, pub_node, pub_seq, _ = self._published_messages()
+        receiver, publisher, seq, latency = self._receipts(ids)
+        pub_keys = (pub_node << 32) | pub_seq
+        if len(pub_keys) == 0:
+            return numpy.zeros(0), numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64)
+        sorter = numpy.argsort(pub_keys, kind='stable')
+        recv_keys = (publisher << 32) | seq
+        position = numpy.minimum(numpy.searchsorted(pub_keys[sorter], recv_keys), len(sorter) - 1)
+        # Leave out the RECVs of messages that weren't published (in this
+        # window, or sampled for this preview)
+        published = (publisher >= 0) & (receiver >= 0) & (pub_keys[sorter][position] == recv_keys)
+        message = sorter[position[published]]
+        receiver, latency = receiver[published], latency[published]
+        # The logs have no duplicate RECVs, but if a node did receive a
+        # message twice, only the first one disseminated it
+        order = numpy.lexsort((latency, receiver, message))
+        message, receiver, latency = message[order], receiver[order], latency[order]
+        first = numpy.ones(len(message), dtype=bool)
+        first[1:] = (message[1:] != message[:-1]) | (receiver[1:] != receiver[:-1])
+        message, latency = message[first], latency[first]
+        order = numpy.lexsort((latency, message))
+        counts = numpy.bincount(message, minlength=len(pub_keys))
+        starts = numpy.cumsum(counts) - counts
+        return latency[order], starts, counts
+
+    @_memoized
+    def dissemination_times(self, fractions=(0.5, 0.9, 1.0)) -> Tuple[numpy.ndarray, ...]:
+        """
+        For every published message (sorted by publisher and sequence number,
+        only the sampled ones for a preview) and each of `fractions`, how long
+        after it was published that fraction of the other nodes had received
+        it, or NaN if that many never did, e.g. for a message nobody received.
+        A node that received a message more than once counts once, at its
+        first RECV (the python engine's receive_times only keep the last one,
+        but the simulator doesn't log duplicates anyway).
+        """
+        values, starts, counts = self._dissemination_segments()
+        receivers = len(self.nodes) - 1
+        times = []
+        for fraction in fractions:
+            # Rounding first so that e.g. 0.7 * 10 needs 7 nodes, not 8
+            needed = max(math.ceil(round(fraction * receivers, 9)), 1)
+            if len(values) == 0:
+                times.append(numpy.full(len(counts), numpy.nan))
+                continue
+            reached = values[numpy.minimum(starts + needed - 1, len(values) - 1)]
+            times.append(numpy.where(counts >= needed, reached, numpy.nan))
+        return tuple(times)
+
+    @_memoized
+    def dissemination_curve(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        The dissemination curve over all published messages: at every time
+        since publishing at which some node received some message, the
+        fraction of all (message, other node) pairs delivered by then. The
+        messages that never arrived somewhere keep the curve below 1. Plot it
+        as a step function, like LatencySketch.cdf.
+        """
+        values, _, counts = self._dissemination_segments()
+        pairs = len(counts) * (len(self.nodes) - 1)
+        return numpy.sort(values), numpy.arange(1, len(values) + 1) / max(pairs, 1)
+
+    @_memoized
+    def delivery_report(self, grace_ms=None) -> dict:
+        """
+        For every ordered pair of distinct nodes, how many of the messages the
+        publisher published the receiver got, and how many it didn't. Missing
+        messages published less than `grace_ms` before the end of the log
+        count as 'late' (probably still propagating when the simulation
+        stopped), the others as 'lost'. By default `grace_ms` is the largest
+        latency of any message that did arrive.
+
+        Returns {(receiver, publisher): {'published': ..., 'received': ...,
+        'late': ..., 'lost': ...}}. For a preview, only the sampled messages
+        count.
+        """
+        if self.recv_table is None and self.latency_sketch is not None:
+            raise Exception('A delivery report needs the receive times, read the log without a latency sketch')
+        names, ids, pub_node, pub_seq, pub_time = self._published_messages()
+        num_nodes = len(names)
+        recv_receiver, recv_publisher, recv_seq, _ = self._receipts(ids)
+        # A publisher that isn't among the nodes (e.g. it only published
+        # before a read_log_window window) has no messages to be missing
+        known = (recv_receiver >= 0) & (recv_publisher >= 0)
+        received_keys = ((recv_receiver[known] * num_nodes + recv_publisher[known]) << 32) | recv_seq[known]
+
+        # Every published message is expected at every node but its publisher
+        expected_receiver = numpy.tile(numpy.arange(num_nodes), len(pub_node))
+        expected_message = numpy.repeat(numpy.arange(len(pub_node)), num_nodes)
+        others = expected_receiver != pub_node[expected_message]
+        expected_receiver, expected_message = expected_receiver[others], expected_message[others]
+        pair = expected_receiver * num_nodes + pub_node[expected_message]
+        missing = ~numpy.isin((pair << 32) | pub_seq[expected_message], received_keys)
+
+        if grace_ms is None:
+            latencies = self._sorted_latency_segments()[0]
+            grace_ms = float(latencies.max()) if len(latencies) else 0
+        late = pub_time[expected_message] > self.end_time - grace_ms
+        cells = num_nodes * num_nodes
+        published = numpy.bincount(pair, minlength=cells)
+        missing_late = numpy.bincount(pair[missing & late], minlength=cells)
+        missing_lost = numpy.bincount(pair[missing & ~late], minlength=cells)
+        report = {}
+        for receiver, receiver_name in enumerate(names):
+            for publisher, publisher_name in enumerate(names):
+                if receiver == publisher:
+                    continue
+                cell = receiver * num_nodes + publisher
+                report[(receiver_name, publisher_name)] = {
+                    'published': int(published[cell]),
+                    'received': int(published[cell] - missing_late[cell] - missing_lost[cell]),
+                    'late': int(missing_late[cell]),
+                    'lost': int(missing_lost[cell]),
+                }
+        return report
+
+    def _published_messages(self) -> Tuple[List[str], dict, numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """
+        The sorted node names, their IDs by name, and the publisher ID,
+        sequence number and publish time of every published message, sorted
+        by publisher and sequence number. For a preview, only the sampled ones.
+        """
+        names = sorted(self.nodes)
+        ids = {name: i for i, name in enumerate(names)}
+        publishers = [publisher for publisher in self.publish_times if publisher in ids]
+        pub_node = numpy.repeat(numpy.array([ids[publisher] for publisher in publishers], dtype=numpy.int64),
+                                [len(self.publish_times[publisher]) for publisher in publishers])
+        pub_seq = numpy.fromiter((seq for publisher in publishers for seq in self.publish_times[publisher]),
+                                 dtype=numpy.int64, count=len(pub_node))
+        pub_time = numpy.fromiter((time for publisher in publishers for time in self.publish_times[publisher].values()),
+                                  dtype=numpy.float64, count=len(pub_node))
+        if self.sample_fraction < 1:
+            sampled = _sampled_messages(names, pub_node, pub_seq, self.sample_fraction)
+            pub_node, pub_seq, pub_time = pub_node[sampled], pub_seq[sampled], pub_time[sampled]
+        # The engines fill publish_times in different orders
+        order = numpy.lexsort((pub_seq, pub_node))
+        return names, ids, pub_node[order], pub_seq[order], pub_time[order]
+
+    def _receipts(self, ids: dict) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """
+        The receiver ID, publisher ID (from `ids`, -1 for a node not in it),
+        sequence number and latency of every RECV.
+        """
+        if self.recv_table is not None:
+            table = self.recv_table
+            lookup = numpy.array([ids.get(name, -1) for name in table.node_names] + [-1], dtype=numpy.int64)
+            return lookup[table.receiver], lookup[table.publisher], table.seq.astype(numpy.int64), \
+                table.latencies()
+        if self.latency_sketch is not None:
+            raise Exception('Per-node latencies need the receive times, read the log without a latency sketch')
+        received = [(ids.get(receiver, -1), ids.get(publisher, -1), seq,
+                     timestamp - self.publish_times.get(publisher, {}).get(seq, math.nan))
+                    for receiver, by_publisher in self.receive_times.items()
+                    for publisher, seqs in by_publisher.items() for seq, timestamp in seqs.items()]
+        receiver, publisher, seq, latency = numpy.array(received, dtype=numpy.float64).reshape(-1, 4).T
+        return receiver.astype(numpy.int64), publisher.astype(numpy.int64), seq.astype(numpy.int64), latency
+
+    def _recv_pairs(self) -> Tuple[List[str], numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """
+        The node names and, for every RECV, the IDs of its publisher and
+        receiver in those names and its latency.
+        """
+        if self.recv_table is not None:
+            table = self.recv_table
+            return table.node_names, table.publisher, table.receiver, table.latencies()
+        if self.latency_sketch is not None:
+            raise Exception('Per-node latencies need the receive times, read the log without a latency sketch')
+        names = sorted(set(self.receive_times) | set(self.publish_times))
+        ids = {name: i for i, name in enumerate(names)}
+        received = [(ids[publisher], ids[receiver], timestamp - self.publish_times[publisher][seq])
+                    for receiver, by_publisher in self.receive_times.items()
+                    for publisher, seqs in by_publisher.items() for seq, timestamp in seqs.items()]
+        publisher, receiver, latency = numpy.array(received, dtype=numpy.float64).reshape(-1, 3).T
+        return names, publisher.astype(numpy.int64), receiver.astype(numpy.int64), latency
+
+    @_memoized
+    def latency_matrix(self) -> dict:
+        """
+        The median and 90th percentile latency (and the number of RECVs) of
+        every publisher and receiver pair, as matrices with a row per
+        publisher and a column per receiver, both in the order of 'nodes'.
+        Pairs without any RECV are NaN.
+        """
+        names, publisher, receiver, latency = self._recv_pairs()
+        num_nodes = len(names)
+        pair = publisher.astype(numpy.int64) * num_nodes + receiver
+        order = numpy.lexsort((latency, pair))
+        counts = numpy.bincount(pair, minlength=num_nodes * num_nodes)
+        starts = numpy.cumsum(counts) - counts
+        nonempty = counts > 0
+        matrix = {'nodes': list(names), 'count': counts.reshape(num_nodes, num_nodes)}
+        for key, percentile in (('median', 50), ('p90', 90)):
+            values = numpy.full(num_nodes * num_nodes, numpy.nan)
+            values[nonempty] = _segment_percentiles(latency[order], starts[nonempty], counts[nonempty], percentile)
+            matrix[key] = values.reshape(num_nodes, num_nodes)
+        return matrix
+
+    @_memoized
+    def node_delay_report(self, percentiles=(50, 90, 99)) -> dict:
+        """
+        The receive delay of every node that received anything: {node:
+        {'count': its RECVs, 'average': their average latency, 'p50': ...}},
+        with a 'p...' entry for each of `percentiles`.
+        """
+        names, _, receiver, latency = self._recv_pairs()
+        receiver = receiver.astype(numpy.int64)
+        # Group the RECVs by receiver, sorted by latency within every group
+        order = numpy.lexsort((latency, receiver))
+        counts = numpy.bincount(receiver, minlength=len(names))
+        totals = numpy.bincount(receiver, weights=latency, minlength=len(names))
+        starts = numpy.cumsum(counts) - counts
+        receivers = numpy.flatnonzero(counts)
+        report = {names[node]: {'count': int(counts[node]), 'average': float(totals[node] / counts[node])}
+                  for node in receivers.tolist()}
+        for percentile in percentiles:
+            values = _segment_percentiles(latency[order], starts[receivers], counts[receivers], percentile)
+            for node, value in zip(receivers.tolist(), values.tolist()):
+                report[names[node]][f'p{percentile:g}'] = value
+        return report
+
+    @_memoized
+    def latency_tail_attribution(self) -> dict:
+        """
+        Which nodes and pairs the RECVs above the run-wide
+        _90th_percentile_latency come from, to find the bottlenecks. Returns
+        the 'threshold' and rankings of the 'pairs' ((publisher, receiver)),
+        'publishers' and 'receivers', each a list of (name, tail RECVs,
+        share of all tail RECVs, total latency above the threshold), worst
+        first.
+        """
+        names, publisher, receiver, latency = self._recv_pairs()
+        num_nodes = len(names)
+        threshold = float(numpy.percentile(latency, 90)) if len(latency) else float('nan')
+        tail = latency > threshold
+        excess = latency[tail] - threshold
+        total = max(int(numpy.count_nonzero(tail)), 1)
+
+        def ranking(groups, num_groups, label):
+            counts = numpy.bincount(groups[tail], minlength=num_groups)
+            excesses = numpy.bincount(groups[tail], weights=excess, minlength=num_groups)
+            ranked = numpy.lexsort((-excesses, -counts))
+            return [(label(group), int(counts[group]), float(counts[group] / total), float(excesses[group]))
+                    for group in ranked.tolist() if counts[group]]
+
+        pair = publisher.astype(numpy.int64) * num_nodes + receiver
+        return {
+            'threshold': threshold,
+            'pairs': ranking(pair, num_nodes * num_nodes,
+                             lambda group: (names[group // num_nodes], names[group % num_nodes])),
+            'publishers': ranking(publisher.astype(numpy.int64), num_nodes, lambda group: names[group]),
+            'receivers': ranking(receiver.astype(numpy.int64), num_nodes, lambda group: names[group]),
+        }
+
+    @_memoized
+    def delivery_ratio(self, grace_ms=None) -> float:
+        """
+        The fraction of the messages that each node should have received that
+        it did, leaving out the late ones (see delivery_report).
+        """
+        received = lost = 0
+        for counts in self.delivery_report(grace_ms).values():
+            received += counts['received']
+            lost += counts['lost']
+        return received / (received + lost) if received + lost else float('nan')
+
+    @_memoized
     def latency_percentile_averages(self) -> Tuple[float, float, float]:
         """
         Returns the average of each latency percentile (50th, 90th and 100th)
@@ -42,48 +605,1845 @@ class LogData:
         # I'm assuming this is  to normalize values s.t they have a standard
         # deviation of 1; the original author did this
         scale = math.sqrt(1)
-        nums50 = []
-        nums90 = []
-        nums100 = []
-        for message in self.latencies:
-            nums50.append(numpy.percentile(self.latencies[message], 50))
-            nums90.append(numpy.percentile(self.latencies[message], 90))
-            nums100.append(max(self.latencies[message]))
-        
+        nums50, nums90, nums100 = self.message_latency_percentiles()
+
         return (
             numpy.average(nums50) / scale,
             numpy.average(nums90) / scale,
             numpy.average(nums100) / scale
         )
 
+    @_memoized
     def _90th_percentile_latency(self) -> float:
         """
         Get all the latencies, put them in one big boat, find the 90th percentile.
         """
-        if self._90th_percentile_latency_value == None:
-            latencies = [latency for _, message_latency in self.latencies.items() for latency in message_latency]
-            self._90th_percentile_latency_value = numpy.percentile(latencies, 90)
-        return self._90th_percentile_latency_value
+        if self.latency_sketch is not None:
+            # Only the sketch has the latencies, see read_log_file
+            return self.latency_sketch.percentile(90)
+        if self.recv_table is not None:
+            return numpy.percentile(self.recv_table.latencies(), 90)
+        latencies = [latency for _, message_latency in self.latencies.items() for latency in message_latency]
+        return numpy.percentile(latencies, 90)
 
+    @_memoized
     def total_pubs_per_second(self) -> float:
-        return len(self.latencies) / (self.end_time / 1000)
+        num_received = len(self.latencies) if self.num_received_messages is None else self.num_received_messages
+        return num_received / self.sample_fraction / (self.end_time / 1000)
+
+    @_memoized
+    def interest_time_series(self, bucket_ms=1000, per_node=False) -> dict:
+        """
+        The number of sync interests of each type sent in every `bucket_ms`
+        of the log, optionally per node; see InterestTable.time_series.
+        """
+        if self.interest_table is None and self.interest_source is not None:
+            self.interest_table = _read_interest_table(*self.interest_source)
+        if self.interest_table is None:
+            raise Exception('This LogData has no interest table')
+        return self.interest_table.time_series(bucket_ms, per_node)
+
+    @_memoized
+    def latency_percentile_average_intervals(self, confidence=0.95) -> Tuple[Tuple[float, float], ...]:
+        """
+        Confidence intervals for the three latency_percentile_averages of a
+        preview, from the spread of the per-message percentiles (a normal
+        approximation, with a finite population correction). They have no
+        width when every message was kept.
+        """
+        z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+        intervals = []
+        for average, values in zip(self.latency_percentile_averages(), self.message_latency_percentiles()):
+            if len(values) < 2:
+                intervals.append((float('-inf'), float('inf')) if self.sample_fraction < 1 else (average, average))
+                continue
+            error = z * numpy.std(values, ddof=1) / math.sqrt(len(values)) * math.sqrt(1 - self.sample_fraction)
+            intervals.append((average - error, average + error))
+        return tuple(intervals)
+
+    @_memoized
+    def _90th_percentile_latency_interval(self, confidence=0.95, resamples=200) -> Tuple[float, float]:
+        """
+        A confidence interval for the _90th_percentile_latency of a preview.
+        The latencies of one message are correlated, so this bootstraps
+        whole messages rather than single latencies. Seeded, so the same
+        preview always gives the same interval.
+        """
+        estimate = self._90th_percentile_latency()
+        if self.sample_fraction >= 1:
+            return estimate, estimate
+        values, starts, counts = self._sorted_latency_segments()
+        rng = numpy.random.default_rng(0)
+        bootstrapped = []
+        for _ in range(resamples):
+            chosen = rng.integers(0, len(counts), len(counts))
+            lengths = counts[chosen]
+            # Indices of all the latencies of the chosen messages
+            offsets = numpy.arange(lengths.sum()) - numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+            bootstrapped.append(numpy.percentile(values[numpy.repeat(starts[chosen], lengths) + offsets], 90))
+        low, high = numpy.percentile(bootstrapped, [50 * (1 - confidence), 50 * (1 + confidence)])
+        return low, high
 
     def complete(self) -> bool:
         """
         Whether or not the log data is finished and includes sync pack, sync byte,
         mtu size, etc.
         """
-        # If MTU_SIZE=0, that means we didn't parse to the end of the file. MTU
-        # size will never be zero normally, because then nothing would ever
-        # transmit and there would be no point to that...
-        return self.mtu_size != 0
+        # If MTU_SIZE=0, that means we didn't parse to the end of the file. MTU
+        # size will never be zero normally, because then nothing would ever
+        # transmit and there would be no point to that...
+        return self.mtu_size != 0
+
+def _segment_percentiles(values: numpy.ndarray, starts: numpy.ndarray,
+                         counts: numpy.ndarray, percentile) -> numpy.ndarray:
+    """
+    numpy.percentile(segment, percentile) for every segment of `values`, which
+    must be sorted within each segment. This repeats the arithmetic of numpy's
+    default ('linear') method step by step so that the results are identical.
+    """
+    quantile = numpy.true_divide(percentile, 100)
+    virtual = (counts - 1) * quantile
+    previous = numpy.floor(virtual)
+    # At (or past) the last element numpy takes the last element as is
+    at_end = virtual >= counts - 1
+    previous_index = numpy.where(at_end, counts - 1, previous).astype(numpy.int64)
+    next_index = numpy.where(at_end, counts - 1, previous + 1).astype(numpy.int64)
+    gamma = virtual - previous
+    return _lerp(values[starts + previous_index], values[starts + next_index], gamma)
+
+
+def _lerp(below: numpy.ndarray, above: numpy.ndarray, gamma: numpy.ndarray) -> numpy.ndarray:
+    """
+    Linear interpolation between `below` and `above`, done exactly like
+    numpy.percentile does it (from the other end when gamma >= 0.5).
+    """
+    difference = above - below
+    result = below + difference * gamma
+    upper = gamma >= 0.5
+    result[upper] = above[upper] - difference[upper] * (1 - gamma[upper])
+    return result
+
+
+class LatencySketch:
+    """
+    A mergeable quantile sketch for latencies, so that percentiles can be
+    found without keeping every latency in memory.
+
+    Values are counted in logarithmically sized buckets: bucket i holds the
+    values in (gamma^(i-1), gamma^i], with gamma = (1 + a) / (1 - a) for a
+    relative accuracy a. Every quantile is then within a relative error of a
+    of the exact one (this is the DDSketch scheme). The memory used only
+    depends on the range of the latencies, not on how many there are, and two
+    sketches with the same accuracy merge without losing anything.
+    """
+    # Values closer to zero than this all go in the zero bucket
+    MIN_VALUE = 1e-9
+
+    def __init__(self, relative_accuracy=0.01):
+        if not 0 < relative_accuracy < 1:
+            raise Exception(f'Invalid relative accuracy {relative_accuracy}')
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        # bucket index -> count, for positive and (mirrored) negative values
+        self.positive = defaultdict(int)
+        self.negative = defaultdict(int)
+        self.zero_count = 0
+        self.count = 0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def _index(self, value) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, index) -> float:
+        # The point of the bucket with the smallest relative error to both ends
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value):
+        """
+        Add a single latency to the sketch.
+        """
+        if value > LatencySketch.MIN_VALUE:
+            self.positive[self._index(value)] += 1
+        elif value < -LatencySketch.MIN_VALUE:
+            self.negative[self._index(-value)] += 1
+        else:
+            self.zero_count += 1
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def add_many(self, values: numpy.ndarray):
+        """
+        Add an array of latencies to the sketch.
+        """
+        values = numpy.asarray(values, dtype=numpy.float64)
+        if not len(values):
+            return
+        for store, selected in ((self.positive, values[values > LatencySketch.MIN_VALUE]),
+                                (self.negative, -values[values < -LatencySketch.MIN_VALUE])):
+            indices, counts = numpy.unique(
+                numpy.ceil(numpy.log(selected) / self._log_gamma).astype(numpy.int64),
+                return_counts=True)
+            for index, count in zip(indices.tolist(), counts.tolist()):
+                store[index] += count
+        self.zero_count += int(numpy.count_nonzero(numpy.abs(values) <= LatencySketch.MIN_VALUE))
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other: 'LatencySketch'):
+        """
+        Add every latency counted by `other` to this sketch.
+        """
+        if other.gamma != self.gamma:
+            raise Exception('Cannot merge latency sketches with different accuracies')
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for index, count in other_store.items():
+                store[index] += count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, quantile) -> float:
+        """
+        The value at `quantile` (between 0 and 1) of the latencies added so far.
+        """
+        if self.count == 0:
+            raise Exception('Cannot take a quantile of an empty latency sketch')
+        rank = quantile * (self.count - 1)
+        seen = 0
+        # Walk from the most negative bucket up to the most positive one
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return max(-self._value(index), self.min)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return min(self._value(index), self.max)
+        return self.max
+
+    def percentile(self, percentile) -> float:
+        return self.quantile(percentile / 100)
+
+    def percentiles(self) -> Tuple[float, float, float]:
+        """
+        The 50th, 90th and 99th percentile latencies.
+        """
+        return self.percentile(50), self.percentile(90), self.percentile(99)
+
+    def buckets(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        The value every non-empty bucket stands for, in increasing order, and
+        how many latencies are in it.
+        """
+        negative = sorted(self.negative, reverse=True)
+        positive = sorted(self.positive)
+        values = [-self._value(index) for index in negative] + \
+            ([0.0] if self.zero_count else []) + [self._value(index) for index in positive]
+        counts = [self.negative[index] for index in negative] + \
+            ([self.zero_count] if self.zero_count else []) + [self.positive[index] for index in positive]
+        return numpy.array(values, dtype=numpy.float64), numpy.array(counts, dtype=numpy.int64)
+
+    def cdf(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        The cumulative distribution of the latencies: for every bucket value,
+        the fraction of the latencies that are at most that value. Ready to be
+        passed to plt.plot or plt.step.
+        """
+        values, counts = self.buckets()
+        return values, numpy.cumsum(counts) / max(self.count, 1)
+
+
+class RecvTable:
+    """
+    Compact, array-backed table of every RECV event of a log, in log order.
+    Node IDs index into `node_names`, which is shared with the LogEvents the
+    table was built from.
+
+    -   publisher:  node that published the message (int32)
+    -   receiver:   node that received it (int32)
+    -   seq:        sequence number of the message (int32)
+    -   publish_ts: publish time the RECV was measured against (float64, ms)
+    -   recv_ts:    time of the RECV (float64, ms)
+    """
+    def __init__(self, node_names, publisher, receiver, seq, publish_ts, recv_ts):
+        self.node_names = node_names
+        self.publisher = publisher
+        self.receiver = receiver
+        self.seq = seq
+        self.publish_ts = publish_ts
+        self.recv_ts = recv_ts
+
+    def __len__(self) -> int:
+        return len(self.recv_ts)
+
+    def latencies(self) -> numpy.ndarray:
+        return self.recv_ts - self.publish_ts
+
+    def message_keys(self) -> numpy.ndarray:
+        return _message_keys(self.publisher, self.seq)
+
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in (self.publisher, self.receiver, self.seq,
+                                                self.publish_ts, self.recv_ts))
+
+
+class InterestTable:
+    """
+    Compact, array-backed table of every sync INTEREST event of a log, in log
+    order. Node IDs index into `node_names`.
+
+    -   node:           node that sent the interest (int32)
+    -   interest_type:  INTEREST_PUBLISH, INTEREST_SUPPRESSION or
+                        INTEREST_PERIODIC (int8)
+    -   ts:             time of the interest (float64, ms)
+    """
+    def __init__(self, node_names, node, interest_type, ts):
+        self.node_names = node_names
+        self.node = node
+        self.interest_type = interest_type
+        self.ts = ts
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def time_series(self, bucket_ms=1000, per_node=False) -> dict:
+        """
+        Count the interests of each type in consecutive buckets of
+        `bucket_ms` milliseconds, starting at 0 and covering the last
+        interest. Returns {'bucket_starts': start of every bucket in ms,
+        'PUBLISH': counts, 'SUPPRESSION': counts, 'PERIODIC': counts}.
+
+        With `per_node`, every count array has a row per node that sent any
+        interest, in the order of the added 'nodes' list.
+        """
+        buckets = (self.ts // bucket_ms).astype(numpy.int64)
+        num_buckets = int(buckets.max()) + 1 if len(buckets) else 0
+        if per_node:
+            node_ids, rows = numpy.unique(self.node, return_inverse=True)
+            nodes = [self.node_names[node] for node in node_ids.tolist()]
+        else:
+            rows = numpy.zeros(len(buckets), dtype=numpy.int64)
+        num_rows = len(nodes) if per_node else 1
+        # One bincount over (type, row, bucket) for all the series at once
+        cells = (self.interest_type.astype(numpy.int64) * num_rows + rows.ravel()) * num_buckets + buckets
+        counts = numpy.bincount(cells, minlength=len(INTEREST_TYPE_NAMES) * num_rows * num_buckets)
+        counts = counts.reshape(len(INTEREST_TYPE_NAMES), num_rows, num_buckets)
+        series = {'bucket_starts': numpy.arange(num_buckets) * bucket_ms}
+        if per_node:
+            series['nodes'] = nodes
+        for interest_type, name in INTEREST_TYPE_NAMES.items():
+            series[name.decode()] = counts[interest_type] if per_node else counts[interest_type][0]
+        return series
+
+
+def _read_interest_table(filepath, timespan=None, size=None, sidecar=True) -> InterestTable:
+    """
+    The InterestTable of a log that was read line by line, which doesn't keep
+    one (see LogData.interest_source): the interests before the first event
+    outside of `timespan`, in the first `size` bytes of the log if given.
+    """
+    if size is None:
+        events = read_log_events(filepath, sidecar)
+    else:
+        events = parse_log_events(_map_log_file(filepath)[:size])
+    table = MetricEvents(events, timespan)
+    is_interest = table.events.action == ACTION_INTEREST
+    return InterestTable(table.events.node_names, table.events.node[is_interest].astype(numpy.int32),
+                         table.events.interest_type[is_interest], table.times[is_interest])
+
+
+class _LatencyView(Mapping):
+    """
+    Read-only view of a RecvTable with the same shape as LogData.latencies:
+    (publisher, seq) -> list of latencies, in log order, with messages in the
+    order they were first received. Like the defaultdict it stands in for,
+    looking up a message that was never received gives an empty list.
+    """
+    def __init__(self, table: RecvTable):
+        self._table = table
+        self._groups = None
+
+    def _index(self) -> dict:
+        if self._groups is None:
+            keys = self._table.message_keys()
+            self._order = numpy.argsort(keys, kind='stable')
+            group_keys, first, counts = numpy.unique(
+                keys[self._order], return_index=True, return_counts=True)
+            names = self._table.node_names
+            self._groups = {}
+            for g in numpy.argsort(self._order[first], kind='stable').tolist():
+                key = int(group_keys[g])
+                self._groups[(names[key >> 32], key & 0xFFFFFFFF)] = \
+                    (int(first[g]), int(first[g] + counts[g]))
+        return self._groups
+
+    def __getitem__(self, message):
+        bounds = self._index().get(message)
+        if bounds is None:
+            return []
+        start, stop = bounds
+        # Only the RECVs of this message, not the latencies of the whole table
+        idx = self._order[start:stop]
+        return (self._table.recv_ts[idx] - self._table.publish_ts[idx]).tolist()
+
+    def __contains__(self, message) -> bool:
+        return message in self._index()
+
+    def __iter__(self):
+        return iter(self._index())
+
+    def __len__(self) -> int:
+        return len(self._index())
+
+
+class _SeqView(Mapping):
+    """
+    seq -> receive time for one (receiver, publisher) pair of a RecvTable.
+    """
+    def __init__(self, seqs: numpy.ndarray, times: numpy.ndarray):
+        self._seqs = seqs
+        self._times = times
+
+    def __getitem__(self, seq):
+        i = numpy.searchsorted(self._seqs, seq)
+        if i < len(self._seqs) and self._seqs[i] == seq:
+            return float(self._times[i])
+        raise KeyError(seq)
+
+    def __contains__(self, seq) -> bool:
+        i = numpy.searchsorted(self._seqs, seq)
+        return bool(i < len(self._seqs) and self._seqs[i] == seq)
+
+    def __iter__(self):
+        return iter(self._seqs.tolist())
+
+    def __len__(self) -> int:
+        return len(self._seqs)
+
+
+class _ReceiverView(Mapping):
+    """
+    publisher -> _SeqView for one receiver of a RecvTable. Looking up a
+    publisher the receiver never heard from gives an empty view.
+    """
+    def __init__(self, names, publishers, seqs, times):
+        self._pairs = {}
+        if len(publishers):
+            starts = numpy.flatnonzero(numpy.concatenate(([True], publishers[1:] != publishers[:-1])))
+            stops = numpy.append(starts[1:], len(publishers))
+            for start, stop in zip(starts.tolist(), stops.tolist()):
+                self._pairs[names[publishers[start]]] = _SeqView(seqs[start:stop], times[start:stop])
+
+    def __getitem__(self, publisher):
+        return self._pairs.get(publisher, _EMPTY_SEQ_VIEW)
+
+    def __contains__(self, publisher) -> bool:
+        return publisher in self._pairs
+
+    def __iter__(self):
+        return iter(self._pairs)
+
+    def __len__(self) -> int:
+        return len(self._pairs)
+
+
+_EMPTY_SEQ_VIEW = _SeqView(numpy.zeros(0, dtype=numpy.int32), numpy.zeros(0))
+
+
+class _ReceiveTimesView(Mapping):
+    """
+    Read-only view of a RecvTable with the same shape as
+    LogData.receive_times: receiver -> publisher -> seq -> receive time. When
+    a message was received more than once, the last RECV wins, as it does in
+    the line-by-line parser.
+    """
+    def __init__(self, table: RecvTable):
+        self._table = table
+        self._receivers = None
+
+    def _index(self) -> dict:
+        if self._receivers is None:
+            table = self._table
+            order = numpy.lexsort((numpy.arange(len(table)), table.seq,
+                                   table.publisher, table.receiver))
+            receiver, publisher, seq = table.receiver[order], table.publisher[order], table.seq[order]
+            # Keep the last RECV of every (receiver, publisher, seq)
+            last = numpy.concatenate(((receiver[1:] != receiver[:-1]) | (publisher[1:] != publisher[:-1]) |
+                                      (seq[1:] != seq[:-1]), [True])) if len(order) else order.astype(bool)
+            self._receiver, self._publisher = receiver[last], publisher[last]
+            self._seq, self._times = seq[last], table.recv_ts[order][last]
+            starts = numpy.flatnonzero(numpy.concatenate(([True], self._receiver[1:] != self._receiver[:-1]))) \
+                if len(self._receiver) else numpy.zeros(0, dtype=numpy.int64)
+            stops = numpy.append(starts[1:], len(self._receiver))
+            names = table.node_names
+            self._receivers = {names[self._receiver[start]]: (start, stop)
+                               for start, stop in zip(starts.tolist(), stops.tolist())}
+            self._views = {}
+        return self._receivers
+
+    def __getitem__(self, receiver):
+        bounds = self._index().get(receiver)
+        if bounds is None:
+            return _ReceiverView(self._table.node_names, [], None, None)
+        if receiver not in self._views:
+            start, stop = bounds
+            self._views[receiver] = _ReceiverView(
+                self._table.node_names, self._publisher[start:stop],
+                self._seq[start:stop], self._times[start:stop])
+        return self._views[receiver]
+
+    def __contains__(self, receiver) -> bool:
+        return receiver in self._index()
+
+    def __iter__(self):
+        return iter(self._index())
+
+    def __len__(self) -> int:
+        return len(self._index())
+
+
+class LogEvents:
+    """
+    Columnar table of every event in a log file, as parsed by the numpy
+    engine. Row `i` of every array describes the `i`-th event line in the log.
+
+    -   node_names: intern table; node and data_node columns index into it
+    -   time_ns:    timestamp of the event in fixed-point int64 nanoseconds
+    -   action:     ACTION_PUB, ACTION_RECV or ACTION_INTEREST
+    -   node:       the node that printed the line
+    -   data_node:  the publisher of the data for PUB/RECV, -1 for INTEREST
+    -   seq:        the sequence number for PUB/RECV, -1 for INTEREST
+    -   interest_type: INTEREST_* for INTEREST events, -1 otherwise
+    -   trailer:    (key, value, events_before) for each SYNC_*/MTU_SIZE line,
+                    where events_before is the number of events printed before
+                    it in the log
+    -   offsets:    byte offset of every event line in the parsed buffer, when
+                    parsed from text (None when loaded from a sidecar)
+    -   diagnostics: the DiagnosticEvents of the debug lines in between
+    """
+    def __init__(self, node_names, time_ns, action, node, data_node, seq,
+                 interest_type, trailer, offsets=None, diagnostics=None):
+        self.node_names = node_names
+        self.time_ns = time_ns
+        self.action = action
+        self.node = node
+        self.data_node = data_node
+        self.seq = seq
+        self.interest_type = interest_type
+        self.trailer = trailer
+        self.offsets = offsets
+        self.diagnostics = diagnostics if diagnostics is not None else DiagnosticEvents.empty()
+
+    def __len__(self) -> int:
+        return len(self.time_ns)
+
+    def times(self) -> numpy.ndarray:
+        """
+        Timestamps as float64 milliseconds. Dividing two exactly representable
+        numbers is correctly rounded, so this is bit-for-bit what float() gives
+        on the original text.
+        """
+        return self.time_ns / 10 ** TIMESTAMP_DECIMALS
+
+
+class DiagnosticEvents:
+    """
+    Columnar table of the diagnostic lines core.cpp prints in debug builds
+    (see DIAGNOSTIC_SUPPRESSION etc.). They have no timestamp of their own,
+    so each one gets that of the last event line before it.
+
+    -   kind:       DIAGNOSTIC_SUPPRESSION, DIAGNOSTIC_OUTDATED_IGNORED (the
+                    entry was less than a network RTT out of date) or
+                    DIAGNOSTIC_OUTDATED_ACCEPTED (older than that)
+    -   time_ns:    timestamp of the last event before the line, 0 if none
+    -   events_before: the number of event lines printed before it
+    -   node:       the node that found the outdated entry, -1 for
+                    suppression lines, which don't say
+    -   data_node:  the node the outdated entry is for, -1 for suppression
+    -   seq:        the outdated sequence number, -1 for suppression
+    -   delta_ms:   how many ms out of date the entry was, -1 for suppression
+
+    node and data_node index into the node_names of the LogEvents.
+    """
+    COLUMNS = ('kind', 'time_ns', 'events_before', 'node', 'data_node', 'seq', 'delta_ms')
+
+    def __init__(self, kind, time_ns, events_before, node, data_node, seq, delta_ms):
+        self.kind = kind
+        self.time_ns = time_ns
+        self.events_before = events_before
+        self.node = node
+        self.data_node = data_node
+        self.seq = seq
+        self.delta_ms = delta_ms
+
+    @staticmethod
+    def empty() -> 'DiagnosticEvents':
+        return DiagnosticEvents(numpy.zeros(0, dtype=numpy.int8), numpy.zeros(0, dtype=numpy.int64),
+                                numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int32),
+                                numpy.zeros(0, dtype=numpy.int32), numpy.zeros(0, dtype=numpy.int32),
+                                numpy.zeros(0, dtype=numpy.int64))
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+    def select(self, mask: numpy.ndarray) -> 'DiagnosticEvents':
+        return DiagnosticEvents(*(getattr(self, column)[mask] for column in self.COLUMNS))
+
+    def of_kind(self, kind) -> 'DiagnosticEvents':
+        return self.select(self.kind == kind)
+
+    def times(self) -> numpy.ndarray:
+        """
+        Timestamps as float64 milliseconds, like LogEvents.times.
+        """
+        return self.time_ns / 10 ** TIMESTAMP_DECIMALS
+
+
+def _gather_fields(buf: numpy.ndarray, starts: numpy.ndarray, width: int) -> numpy.ndarray:
+    """
+    Gather `width` bytes starting at every position in `starts` into a 2D
+    array, one row per field. Callers mask out the bytes that do not belong to
+    the field themselves.
+    """
+    fields = numpy.empty((len(starts), width), dtype=numpy.uint8)
+    columns = numpy.arange(width)[None, :]
+    # The indices are int64, so only build them for a batch of rows at once
+    for batch in range(0, len(starts), PARSE_BATCH_ROWS):
+        rows = slice(batch, batch + PARSE_BATCH_ROWS)
+        buf.take(starts[rows, None] + columns, out=fields[rows], mode='clip')
+    return fields
+
+
+def _byte_positions(buf: numpy.ndarray, byte: bytes) -> numpy.ndarray:
+    """
+    numpy.flatnonzero(buf == byte), without a mask as large as the buffer.
+    """
+    value = ord(byte)
+    positions = [numpy.flatnonzero(buf[block:block + PARSE_BATCH_BYTES] == value) + block
+                 for block in range(0, len(buf), PARSE_BATCH_BYTES)]
+    return numpy.concatenate(positions) if positions else numpy.zeros(0, dtype=numpy.int64)
+
+
+def _parse_fixed_point(buf: numpy.ndarray, starts: numpy.ndarray,
+                       ends: numpy.ndarray, decimals: int = 0) -> numpy.ndarray:
+    """
+    Parse the unsigned decimal numbers in buf[start:end] for every field into
+    int64 fixed-point values with `decimals` digits after the decimal point.
+    """
+    if len(starts) == 0:
+        return numpy.zeros(0, dtype=numpy.int64)
+    if numpy.any(ends <= starts):
+        raise Exception('Empty numeric field in log')
+    values = numpy.empty(len(starts), dtype=numpy.int64)
+    for batch in range(0, len(starts), PARSE_BATCH_ROWS):
+        rows = slice(batch, batch + PARSE_BATCH_ROWS)
+        lengths = ends[rows] - starts[rows]
+        width = int(lengths.max())
+        chars = _gather_fields(buf, starts[rows], width)
+        inside = numpy.arange(width)[None, :] < lengths[:, None]
+        # Find the decimal point of every field (or the end, if there is none)
+        is_dot = (chars == ord('.')) & inside
+        has_dot = is_dot.any(axis=1)
+        dot = numpy.where(has_dot, is_dot.argmax(axis=1), lengths)
+        fraction_digits = numpy.where(has_dot, lengths - dot - 1, 0)
+        if numpy.any(fraction_digits > decimals):
+            raise Exception(f'Number in log has more than {decimals} decimal places')
+        if numpy.any(dot > 18 - decimals):
+            raise Exception('Number in log is too large')
+        # Bytes below '0' wrap around, so anything but a digit is above 9
+        chars -= ord('0')
+        is_digit = inside & ~is_dot
+        if numpy.any(is_digit & (chars > 9)) or numpy.any(is_dot.sum(axis=1) > 1):
+            raise Exception('Malformed number in log')
+        # Horner's rule over the columns, skipping the decimal point and the
+        # bytes past the end of each field, then scale the fraction up to
+        # `decimals` digits
+        value = numpy.zeros(len(lengths), dtype=numpy.int64)
+        for column in range(width):
+            value = numpy.where(is_digit[:, column], value * 10 + chars[:, column], value)
+        values[rows] = value * 10 ** (decimals - fraction_digits)
+    return values
+
+
+def _intern_fields(buf: numpy.ndarray, starts: numpy.ndarray,
+                   ends: numpy.ndarray) -> Tuple[List[str], numpy.ndarray]:
+    """
+    Intern the byte strings buf[start:end]. Returns the sorted table of unique
+    strings and, for every field, its index into that table.
+    """
+    if len(starts) == 0:
+        return [], numpy.zeros(0, dtype=numpy.int32)
+    lengths = ends - starts
+    # Pad every string with zeros to a multiple of 8 bytes, so that it can be
+    # compared as big-endian 64-bit words, which sort like the strings do.
+    width = max(-(-int(lengths.max()) // 8) * 8, 8)
+    columns = numpy.arange(width)[None, :]
+    # Intern every batch of rows on its own, then the (few) names found in
+    # all the batches, so that no sort runs over all the fields at once
+    ids = numpy.empty(len(starts), dtype=numpy.int32)
+    batch_words = []
+    batch_offsets = []
+    for batch in range(0, len(starts), PARSE_BATCH_ROWS):
+        rows = slice(batch, batch + PARSE_BATCH_ROWS)
+        padded = _gather_fields(buf, starts[rows], width)
+        padded[columns >= lengths[rows, None]] = 0
+        unique_words, ids[rows] = _unique_rows(padded.view('>u8'))
+        batch_offsets.append(sum(len(words) for words in batch_words))
+        batch_words.append(unique_words)
+    unique_words, batch_ids = _unique_rows(numpy.concatenate(batch_words))
+    for offset, batch in zip(batch_offsets, range(0, len(starts), PARSE_BATCH_ROWS)):
+        rows = slice(batch, batch + PARSE_BATCH_ROWS)
+        ids[rows] = batch_ids[ids[rows] + offset]
+    names = [row.tobytes().rstrip(b'\0').decode()
+             for row in numpy.ascontiguousarray(unique_words.astype('>u8'))]
+    return names, ids
+
+
+def _unique_rows(words: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    The sorted unique rows of a 2D array and, for every row, its index among
+    them (as int32).
+    """
+    if words.shape[1] == 1:
+        unique_words, ids = numpy.unique(words[:, 0], return_inverse=True)
+        unique_words = unique_words[:, None]
+    else:
+        unique_words, ids = numpy.unique(words, axis=0, return_inverse=True)
+    return unique_words, ids.astype(numpy.int32).ravel()
+
+
+def _dispatch_prefixes(buf: numpy.ndarray, starts: numpy.ndarray, prefixes: dict,
+                       lengths: numpy.ndarray = None) -> numpy.ndarray:
+    """
+    Returns, for each position in `starts`, the key of the entry of `prefixes`
+    whose bytes the buffer begins with there, or -1 if there is none. If
+    `lengths` is given, the field must also be exactly that long.
+    """
+    codes = numpy.full(len(starts), -1, dtype=numpy.int8)
+    width = max(len(prefix) for prefix in prefixes.values())
+    head = _gather_fields(buf, starts, width)
+    for code, prefix in prefixes.items():
+        expected = numpy.frombuffer(prefix, dtype=numpy.uint8)
+        matches = numpy.all(head[:, :len(prefix)] == expected, axis=1) & \
+            (starts + len(prefix) <= len(buf))
+        if lengths is not None:
+            matches &= lengths == len(prefix)
+        codes[matches] = code
+    return codes
+
+
+def _line_bounds(buf: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Start and end (exclusive, without the newline) of every non-empty line.
+    """
+    newlines = _byte_positions(buf, b'\n')
+    if len(buf) and buf[-1] != ord('\n'):
+        newlines = numpy.append(newlines, len(buf))
+    line_starts = numpy.concatenate(([0], newlines[:-1] + 1)).astype(numpy.int64)
+    line_ends = newlines.astype(numpy.int64)
+    nonempty = line_ends > line_starts
+    return line_starts[nonempty], line_ends[nonempty]
+
+
+def log_compression(filepath) -> str:
+    """
+    How a log is compressed ('gzip' or 'zstd'), going by its suffix, or None.
+    """
+    for compression, suffix in LOG_COMPRESSION_SUFFIXES.items():
+        if filepath.endswith(suffix):
+            return compression
+    return None
+
+
+def find_log_file(filepath) -> str:
+    """
+    The path of the log `filepath`, which may have been stored compressed
+    (with a .gz or .zst suffix added). Returns None if there is no such log.
+    """
+    candidates = [candidate for candidate in
+                  [filepath] + [filepath + suffix for suffix in LOG_COMPRESSION_SUFFIXES.values()]
+                  if os.path.isfile(candidate)]
+    return _preferred_log(candidates) if candidates else None
+
+
+def _log_stem(filepath) -> str:
+    """
+    The name of a log without its compression suffix.
+    """
+    compression = log_compression(filepath)
+    return filepath[:-len(LOG_COMPRESSION_SUFFIXES[compression])] if compression else filepath
+
+
+def _preferred_log(candidates: List[str]) -> str:
+    """
+    Pick one of several copies of the same log (e.g. x and x.gz, when a
+    simulation was re-run after the first one got compressed). The first
+    candidate that has its full trailer wins, so a re-run that crashed doesn't
+    hide the complete copy; if none of them is complete, the first one.
+    """
+    if len(candidates) > 1:
+        for candidate in candidates:
+            if trailer_complete(read_log_trailer(candidate)):
+                return candidate
+    return candidates[0]
+
+
+def glob_logs(pattern) -> List[str]:
+    """
+    Like glob.glob, but also finds the compressed logs whose name without the
+    compression suffix matches `pattern`. Every log is only returned once:
+    when it is there both raw and compressed, find_log_file picks the copy.
+    """
+    logs = set(glob.glob(pattern))
+    for suffix in LOG_COMPRESSION_SUFFIXES.values():
+        logs.update(glob.glob(pattern + suffix))
+    by_stem = {}
+    for filepath in logs:
+        by_stem.setdefault(_log_stem(filepath), []).append(filepath)
+    return sorted(find_log_file(stem) if len(copies) > 1 else copies[0]
+                  for stem, copies in by_stem.items())
+
+
+def open_log_file(filepath, mode='r'):
+    """
+    Open a log for reading ('r' or 'rb') or writing ('wb'), compressing or
+    decompressing it on the fly if its suffix says it is compressed.
+    """
+    compression = log_compression(filepath)
+    if compression is None:
+        return open(filepath, mode)
+    if compression == 'gzip':
+        hdl = gzip.open(filepath, 'wb' if 'w' in mode else 'rb',
+                        compresslevel=LOG_COMPRESSION_LEVELS['gzip'])
+    else:
+        if zstandard is None:
+            raise Exception(f'Reading or writing {filepath} needs the zstandard package')
+        raw = open(filepath, 'wb' if 'w' in mode else 'rb')
+        if 'w' in mode:
+            hdl = zstandard.ZstdCompressor(level=LOG_COMPRESSION_LEVELS['zstd'], threads=-1) \
+                .stream_writer(raw, closefd=True)
+        else:
+            hdl = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return hdl if 'b' in mode else io.TextIOWrapper(hdl)
+
+
+def _read_log_bytes(filepath) -> bytes:
+    """
+    The whole (decompressed) contents of a log.
+    """
+    with open_log_file(filepath, 'rb') as hdl:
+        return hdl.read()
+
+
+def _read_truncated_log_bytes(filepath) -> Tuple[bytes, bool]:
+    """
+    Like _read_log_bytes, but a compressed log that was cut off (because the
+    simulator crashed while writing it, or the copy was interrupted) gives
+    what could be decompressed before the cut instead of an error. Returns
+    (contents, whether the log was cut off).
+    """
+    errors = (EOFError,) if zstandard is None else (EOFError, zstandard.ZstdError)
+    chunks = []
+    try:
+        with open_log_file(filepath, 'rb') as hdl:
+            while True:
+                chunk = hdl.read(TRUNCATED_READ_CHUNK_BYTES)
+                if not chunk:
+                    return b''.join(chunks), False
+                chunks.append(chunk)
+    except errors:
+        # gzip notices the missing end of stream; zstd just stops early, and
+        # only complains about a frame that is damaged
+        return b''.join(chunks), True
+
+
+def _map_log_file(filepath) -> numpy.ndarray:
+    """
+    Memory-map a log file read-only and return its bytes as a uint8 array
+    without copying them. The mapping is released once the array (and every
+    view of it) is garbage collected. Compressed logs are decompressed into
+    memory instead.
+    """
+    if log_compression(filepath):
+        return numpy.frombuffer(_read_log_bytes(filepath), dtype=numpy.uint8)
+    with open(filepath, 'rb') as hdl:
+        if os.fstat(hdl.fileno()).st_size == 0:
+            return numpy.zeros(0, dtype=numpy.uint8)
+        mapped = mmap.mmap(hdl.fileno(), 0, access=mmap.ACCESS_READ)
+    return numpy.frombuffer(mapped, dtype=numpy.uint8)
+
+
+def parse_log_events(data) -> LogEvents:
+    """
+    Parse the raw bytes of a log file into a LogEvents table with array
+    operations only; no Python object is created per line. `data` can be
+    anything exposing the buffer protocol, including an mmap.
+
+    Every record is dispatched on its first bytes (see TRAILER_PREFIXES,
+    ACTION_PREFIXES and INTEREST_TYPE_NAMES) instead of being decoded.
+    """
+    buf = numpy.frombuffer(data, dtype=numpy.uint8)
+    line_starts, line_ends = _line_bounds(buf)
+    first = buf[line_starts]
+
+    # Edge case: end of the file, printing stats and stuff.
+    trailer_key = numpy.full(len(line_starts), -1, dtype=numpy.int8)
+    candidates = (first == ord('S')) | (first == ord('M'))
+    trailer_key[candidates] = _dispatch_prefixes(
+        buf, line_starts[candidates], dict(enumerate(TRAILER_PREFIXES.values())))
+    is_trailer = trailer_key >= 0
+    is_event = (first >= ord('0')) & (first <= ord('9'))
+    # Debug builds of core.cpp print diagnostics in between; they are checked
+    # more closely by _parse_diagnostic_lines
+    is_diagnostic = ~is_trailer & ~is_event & ((first == ord('(')) | (first == ord('/')))
+    if numpy.any(~is_trailer & ~is_event & ~is_diagnostic):
+        bad = line_starts[~is_trailer & ~is_event & ~is_diagnostic][0]
+        raise Exception(f'Unrecognized log line at byte {bad}')
+    events_before = numpy.cumsum(is_event) - is_event
+    trailer_keys = list(TRAILER_PREFIXES)
+    prefix_lengths = numpy.array([len(prefix) for prefix in TRAILER_PREFIXES.values()])
+    trailer_key = trailer_key[is_trailer]
+    trailer_values = _parse_fixed_point(
+        buf, line_starts[is_trailer] + prefix_lengths[trailer_key], line_ends[is_trailer])
+    trailer = [(trailer_keys[key], value, before) for key, value, before in zip(
+        trailer_key.tolist(), trailer_values.tolist(), events_before[is_trailer].tolist())]
+    starts, ends = line_starts[is_event], line_ends[is_event]
+
+    commas = _byte_positions(buf, b',')
+    colons = _byte_positions(buf, b':')
+    diagnostic_kind, outdated, outdated_names, outdated_seq, outdated_delta = _parse_diagnostic_lines(
+        buf, line_starts[is_diagnostic], line_ends[is_diagnostic], commas, colons)
+
+    # The first three commas split timestamp, node, action and data
+    first_comma = numpy.searchsorted(commas, starts)
+    if numpy.any(first_comma + 2 >= len(commas)) or \
+            numpy.any(commas[numpy.minimum(first_comma + 2, len(commas) - 1)] >= ends):
+        raise Exception('Malformed event line in log')
+    c0, c1, c2 = commas[first_comma], commas[first_comma + 1], commas[first_comma + 2]
+    # Only the fields of the event lines are needed from here on, so let the
+    # arrays over every line and comma go before the bigger ones below
+    del commas, first_comma, line_starts, line_ends
+    # Ignore trailing whitespace on the last field, like .strip() would
+    while True:
+        trailing = (buf[ends - 1] == ord('\r')) | (buf[ends - 1] == ord(' '))
+        if not numpy.any(trailing):
+            break
+        ends = ends - trailing
+
+    time_ns = _parse_fixed_point(buf, starts, c0, TIMESTAMP_DECIMALS)
+
+    action = _dispatch_prefixes(buf, c1 + 1, ACTION_PREFIXES, c2 - c1)
+    if numpy.any(action < 0):
+        raise Exception('Unrecognized message!')
+    is_interest = action == ACTION_INTEREST
+    is_data = ~is_interest
+
+    interest_type = numpy.full(len(starts), -1, dtype=numpy.int8)
+    type_starts, type_lengths = c2[is_interest] + 1, (ends - c2 - 1)[is_interest]
+    types = _dispatch_prefixes(buf, type_starts, INTEREST_TYPE_NAMES, type_lengths)
+    if numpy.any(types < 0):
+        raise Exception('Unknown interest type in log')
+    interest_type[is_interest] = types
+
+    # Data is "/<data_node>::<seq>"
+    data_starts, data_ends = c2[is_data] + 1, ends[is_data]
+    if len(data_starts) and len(colons) == 0:
+        raise Exception('Malformed data in log')
+    colon = colons[numpy.minimum(numpy.searchsorted(colons, data_starts), len(colons) - 1)] \
+        if len(colons) else numpy.zeros(0, dtype=numpy.int64)
+    if numpy.any((colon < data_starts) | (colon + 2 >= data_ends)):
+        raise Exception('Malformed data in log')
+    seq = numpy.full(len(starts), -1, dtype=numpy.int32)
+    seq[is_data] = _parse_fixed_point(buf, colon + 2, data_ends)
+
+    # Intern the node names (dropping the leading '/') of both columns, and
+    # of the diagnostics, at once
+    name_starts = numpy.concatenate((c0 + 2, data_starts + 1) + outdated_names[::2])
+    name_ends = numpy.concatenate((c1, colon) + outdated_names[1::2])
+    node_names, ids = _intern_fields(buf, name_starts, name_ends)
+    node = ids[:len(starts)]
+    data_node = numpy.full(len(starts), -1, dtype=numpy.int32)
+    data_node[is_data] = ids[len(starts):len(starts) + len(data_starts)]
+
+    diagnostic_before = events_before[is_diagnostic]
+    diagnostic_node = numpy.full(len(diagnostic_kind), -1, dtype=numpy.int32)
+    diagnostic_data_node = numpy.full(len(diagnostic_kind), -1, dtype=numpy.int32)
+    diagnostic_node[outdated], diagnostic_data_node[outdated] = \
+        ids[len(starts) + len(data_starts):].reshape(2, -1)
+    diagnostic_seq = numpy.full(len(diagnostic_kind), -1, dtype=numpy.int32)
+    diagnostic_seq[outdated] = outdated_seq
+    diagnostic_delta = numpy.full(len(diagnostic_kind), -1, dtype=numpy.int64)
+    diagnostic_delta[outdated] = outdated_delta
+    diagnostics = DiagnosticEvents(
+        diagnostic_kind, _time_before(time_ns, diagnostic_before),
+        diagnostic_before, diagnostic_node, diagnostic_data_node, diagnostic_seq, diagnostic_delta)
+
+    return LogEvents(node_names, time_ns, action, node, data_node, seq,
+                     interest_type, trailer, starts, diagnostics)
+
+
+def _time_before(time_ns: numpy.ndarray, events_before: numpy.ndarray) -> numpy.ndarray:
+    """
+    The timestamp of the last event before each of the positions
+    `events_before`, or 0 if there is none.
+    """
+    if len(time_ns) == 0:
+        return numpy.zeros(len(events_before), dtype=numpy.int64)
+    return numpy.where(events_before > 0, time_ns[numpy.maximum(events_before - 1, 0)], 0)
+
+
+def _parse_diagnostic_lines(buf: numpy.ndarray, starts: numpy.ndarray, ends: numpy.ndarray,
+                            commas: numpy.ndarray, colons: numpy.ndarray) -> tuple:
+    """
+    Classify the diagnostic lines buf[start:end] by their bytes (see
+    DIAGNOSTIC_SUPPRESSION etc.) and parse the fields of the outdated entry
+    lines. `commas` and `colons` are the positions of those in the buffer.
+
+    Returns (kind of every line, indices of the outdated entry lines among
+    them, (node name starts, node name ends, data node name starts, data node
+    name ends), their sequence numbers, their delta_ms).
+    """
+    kind = numpy.full(len(starts), -1, dtype=numpy.int8)
+    if len(starts) == 0:
+        empty = numpy.zeros(0, dtype=numpy.int64)
+        return kind, empty, (empty, empty, empty, empty), empty, empty
+    while True:
+        trailing = (buf[ends - 1] == ord('\r')) | (buf[ends - 1] == ord(' '))
+        if not numpy.any(trailing):
+            break
+        ends = ends - trailing
+    suppression = _dispatch_prefixes(buf, starts, {DIAGNOSTIC_SUPPRESSION: DIAGNOSTIC_SUPPRESSION_LINE},
+                                     ends - starts)
+    kind[suppression >= 0] = DIAGNOSTIC_SUPPRESSION
+
+    outdated = numpy.flatnonzero(buf[starts] == ord('/'))
+    line_starts, line_ends = starts[outdated], ends[outdated]
+    valid = numpy.ones(len(outdated), dtype=bool)
+    # "/<node>,Found outdated entry /<data_node>::<seq><reason><delta> ms out of date)"
+    comma = commas[numpy.minimum(numpy.searchsorted(commas, line_starts), len(commas) - 1)] \
+        if len(commas) else line_ends
+    valid &= (comma > line_starts + 1) & (comma < line_ends)
+    valid &= _dispatch_prefixes(buf, comma + 1, {0: DIAGNOSTIC_OUTDATED_PREFIX}) == 0
+    entry = comma + 1 + len(DIAGNOSTIC_OUTDATED_PREFIX)
+    valid &= buf.take(entry, mode='clip') == ord('/')
+    colon = colons[numpy.minimum(numpy.searchsorted(colons, entry), len(colons) - 1)] \
+        if len(colons) else line_ends
+    valid &= (colon > entry + 1) & (colon + 2 < line_ends)
+    spaces = _byte_positions(buf, b' ') if len(outdated) else numpy.zeros(0, dtype=numpy.int64)
+    space = spaces[numpy.minimum(numpy.searchsorted(spaces, colon), len(spaces) - 1)] \
+        if len(spaces) else line_ends
+    valid &= (space > colon + 2) & (space < line_ends)
+    reason = _dispatch_prefixes(buf, space, DIAGNOSTIC_OUTDATED_REASONS)
+    valid &= reason >= 0
+    reason_lengths = numpy.array([len(DIAGNOSTIC_OUTDATED_REASONS.get(code, b''))
+                                  for code in range(max(DIAGNOSTIC_OUTDATED_REASONS) + 1)])
+    delta_start = space + reason_lengths[numpy.maximum(reason, 0)]
+    delta_end = line_ends - len(DIAGNOSTIC_OUTDATED_SUFFIX)
+    valid &= delta_end > delta_start
+    valid &= _dispatch_prefixes(buf, delta_end, {0: DIAGNOSTIC_OUTDATED_SUFFIX}) == 0
+    kind[outdated[valid]] = reason[valid]
+    if numpy.any(kind < 0):
+        raise Exception(f'Unrecognized log line at byte {starts[kind < 0][0]}')
+
+    # delta_ms is a signed long
+    negative = buf[delta_start] == ord('-')
+    delta = _parse_fixed_point(buf, delta_start + negative, delta_end)
+    return kind, outdated, (line_starts + 1, comma, entry + 1, colon), \
+        _parse_fixed_point(buf, colon + 2, space), numpy.where(negative, -delta, delta)
+
+
+def _slice_events(events: LogEvents, start, stop) -> LogEvents:
+    """
+    The events in [start, stop), with the trailer and diagnostic positions
+    shifted to match. Trailer lines before `start` are dropped, and so are
+    diagnostic lines outside of the slice.
+    """
+    diagnostics = events.diagnostics.select((events.diagnostics.events_before >= start) &
+                                            (events.diagnostics.events_before <= stop))
+    diagnostics.events_before = diagnostics.events_before - start
+    return LogEvents(events.node_names, events.time_ns[start:stop], events.action[start:stop],
+                     events.node[start:stop], events.data_node[start:stop],
+                     events.seq[start:stop], events.interest_type[start:stop],
+                     [(key, value, before - start) for key, value, before in events.trailer
+                      if before >= start],
+                     None if events.offsets is None else events.offsets[start:stop],
+                     diagnostics)
+
+
+def _sidecar_path(filepath, suffix) -> str:
+    """
+    Where a derived artifact of a log lives. They go in a hidden directory next
+    to the log so that globs like `experiment_dir + 'base-*'` never see them.
+    """
+    directory, name = os.path.split(os.path.abspath(filepath))
+    return os.path.join(directory, SIDECAR_DIRNAME, name + suffix)
+
+
+def _file_signature(filepath) -> List[int]:
+    """
+    The size and modification time of a file; a sidecar is only valid for the
+    exact log it was built from.
+    """
+    stat = os.stat(filepath)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _save_sidecar(path, arrays: dict, meta: dict):
+    """
+    Atomically write `arrays` and a JSON `meta` dict to an uncompressed .npz,
+    so that _load_sidecar can memory-map every column back.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    arrays = dict(arrays, meta=numpy.frombuffer(json.dumps(meta).encode(), dtype=numpy.uint8))
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as hdl:
+        numpy.savez(hdl, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _load_sidecar(path) -> Tuple[dict, dict]:
+    """
+    Memory-map every array in an uncompressed .npz written by _save_sidecar.
+    Returns (arrays, meta), or (None, None) if there is no readable sidecar.
+    """
+    if not os.path.isfile(path):
+        return None, None
+    arrays = {}
+    try:
+        with zipfile.ZipFile(path) as archive, open(path, 'rb') as hdl:
+            mapped = mmap.mmap(hdl.fileno(), 0, access=mmap.ACCESS_READ)
+            for info in archive.infolist():
+                if info.compress_type != zipfile.ZIP_STORED:
+                    return None, None
+                # Skip the zip local file header to get to the .npy member
+                hdl.seek(info.header_offset)
+                header = hdl.read(30)
+                name_length, extra_length = struct.unpack('<HH', header[26:30])
+                hdl.seek(info.header_offset + 30 + name_length + extra_length)
+                version = numpy.lib.format.read_magic(hdl)
+                if version == (1, 0):
+                    shape, fortran_order, dtype = numpy.lib.format.read_array_header_1_0(hdl)
+                else:
+                    shape, fortran_order, dtype = numpy.lib.format.read_array_header_2_0(hdl)
+                count = int(numpy.prod(shape))
+                array = numpy.frombuffer(mapped, dtype=dtype, count=count, offset=hdl.tell())
+                arrays[info.filename[:-len('.npy')]] = \
+                    array.reshape(shape, order='F' if fortran_order else 'C')
+    except (OSError, ValueError, zipfile.BadZipFile, struct.error):
+        return None, None
+    meta = json.loads(arrays.pop('meta').tobytes().decode())
+    return arrays, meta
+
+
+def write_event_sidecar(filepath, events: LogEvents):
+    """
+    Store the decoded event table of a log in its columnar sidecar.
+    """
+    trailer_keys = list(TRAILER_PREFIXES)
+    keys, values, before = zip(*events.trailer) if events.trailer else ((), (), ())
+    _save_sidecar(_sidecar_path(filepath, EVENT_SIDECAR_SUFFIX), {
+        'node_names': numpy.array(events.node_names, dtype=str),
+        'time_ns': events.time_ns,
+        'action': events.action,
+        'node': events.node,
+        'data_node': events.data_node,
+        'seq': events.seq,
+        'interest_type': events.interest_type,
+        'trailer_key': numpy.array([trailer_keys.index(key) for key in keys], dtype=numpy.int8),
+        'trailer_value': numpy.array(values, dtype=numpy.int64),
+        'trailer_before': numpy.array(before, dtype=numpy.int64),
+        **{f'diagnostic_{column}': getattr(events.diagnostics, column)
+           for column in DiagnosticEvents.COLUMNS},
+    }, {'version': SIDECAR_VERSION, 'signature': _file_signature(filepath)})
+
+
+def load_event_sidecar(filepath) -> LogEvents:
+    """
+    Memory-map the columnar sidecar of a log. Returns None if there is none,
+    or if the log changed size or modification time since it was written.
+    """
+    arrays, meta = _load_sidecar(_sidecar_path(filepath, EVENT_SIDECAR_SUFFIX))
+    if arrays is None or meta.get('version') != SIDECAR_VERSION or \
+            meta.get('signature') != _file_signature(filepath):
+        return None
+    trailer_keys = list(TRAILER_PREFIXES)
+    trailer = [(trailer_keys[key], value, before) for key, value, before in zip(
+        arrays['trailer_key'].tolist(), arrays['trailer_value'].tolist(),
+        arrays['trailer_before'].tolist())]
+    return LogEvents(arrays['node_names'].tolist(), arrays['time_ns'], arrays['action'],
+                     arrays['node'], arrays['data_node'], arrays['seq'],
+                     arrays['interest_type'], trailer,
+                     diagnostics=DiagnosticEvents(*(arrays[f'diagnostic_{column}']
+                                                    for column in DiagnosticEvents.COLUMNS)))
+
+
+def write_latency_histogram(filepath, sketch: LatencySketch):
+    """
+    Store the latency histogram (a LatencySketch) of a log next to it.
+    """
+    arrays = {}
+    for sign, store in (('positive', sketch.positive), ('negative', sketch.negative)):
+        indices = sorted(store)
+        arrays[f'{sign}_index'] = numpy.array(indices, dtype=numpy.int64)
+        arrays[f'{sign}_count'] = numpy.array([store[index] for index in indices], dtype=numpy.int64)
+    _save_sidecar(_sidecar_path(filepath, LATENCY_HISTOGRAM_SUFFIX), arrays, {
+        'version': SIDECAR_VERSION, 'signature': _file_signature(filepath),
+        'relative_accuracy': sketch.relative_accuracy, 'zero_count': sketch.zero_count,
+        'count': sketch.count, 'min': sketch.min, 'max': sketch.max})
+
+
+def load_latency_histogram(filepath, relative_accuracy=0.01) -> LatencySketch:
+    """
+    Load the stored latency histogram of a log. Returns None if there is none,
+    if it has a different accuracy, or if the log changed since.
+    """
+    arrays, meta = _load_sidecar(_sidecar_path(filepath, LATENCY_HISTOGRAM_SUFFIX))
+    if arrays is None or meta.get('version') != SIDECAR_VERSION or \
+            meta.get('signature') != _file_signature(filepath) or \
+            meta.get('relative_accuracy') != relative_accuracy:
+        return None
+    sketch = LatencySketch(relative_accuracy)
+    for sign, store in (('positive', sketch.positive), ('negative', sketch.negative)):
+        store.update(zip(arrays[f'{sign}_index'].tolist(), arrays[f'{sign}_count'].tolist()))
+    sketch.zero_count = meta['zero_count']
+    sketch.count = meta['count']
+    sketch.min = meta['min']
+    sketch.max = meta['max']
+    return sketch
+
+
+def latency_histogram(filepath, relative_accuracy=0.01, sidecar=True) -> LatencySketch:
+    """
+    The latency histogram of a whole log. It is computed once and then stored
+    next to the log, so later calls don't read the log at all.
+    """
+    sketch = load_latency_histogram(filepath, relative_accuracy) if sidecar else None
+    if sketch is None:
+        sketch = LatencySketch(relative_accuracy)
+        log_data = _log_data_from_events(read_log_events(filepath, sidecar))
+        sketch.add_many(log_data.recv_table.latencies())
+        if sidecar:
+            write_latency_histogram(filepath, sketch)
+    return sketch
+
+
+def merge_latency_histograms(filepaths, relative_accuracy=0.01) -> LatencySketch:
+    """
+    Merge the latency histograms of several logs (e.g. replicas of the same
+    experiment) into one, to get percentiles and CDFs across all of them.
+    """
+    merged = LatencySketch(relative_accuracy)
+    for filepath in filepaths:
+        merged.merge(latency_histogram(filepath, relative_accuracy))
+    return merged
+
+
+def _chunk_bounds(filepath, num_chunks) -> List[Tuple[int, int]]:
+    """
+    Split a file into at most `num_chunks` byte ranges of roughly equal size
+    that start and end on line boundaries.
+    """
+    size = os.path.getsize(filepath)
+    bounds = [0]
+    with open(filepath, 'rb') as hdl:
+        for i in range(1, num_chunks):
+            hdl.seek(max(size * i // num_chunks, bounds[-1]))
+            hdl.readline()
+            if hdl.tell() >= size:
+                break
+            bounds.append(hdl.tell())
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def _iter_log_chunks(filepath, chunk_bytes):
+    """
+    Yield the bytes of a log as uint8 arrays of about `chunk_bytes` that end
+    on line boundaries, without ever holding more than a chunk in memory.
+    Compressed logs are decompressed as they are read.
+    """
+    if not log_compression(filepath):
+        num_chunks = max(1, math.ceil(os.path.getsize(filepath) / chunk_bytes))
+        buf = _map_log_file(filepath)
+        for start, end in _chunk_bounds(filepath, num_chunks):
+            yield buf[start:end]
+        return
+    partial = b''
+    with open_log_file(filepath, 'rb') as hdl:
+        while True:
+            data = hdl.read(chunk_bytes)
+            if not data:
+                break
+            data = partial + data
+            cut = data.rfind(b'\n') + 1
+            partial = data[cut:]
+            if cut:
+                yield numpy.frombuffer(data[:cut], dtype=numpy.uint8)
+    if partial:
+        yield numpy.frombuffer(partial, dtype=numpy.uint8)
+
+
+def _parse_log_chunk(filepath, start, end) -> LogEvents:
+    """
+    Parse the lines in bytes [start, end) of a log. Runs in a worker process;
+    the node IDs in the result index into the chunk's own intern table.
+    """
+    return parse_log_events(_map_log_file(filepath)[start:end])
+
+
+def merge_log_events(chunks: List[LogEvents]) -> LogEvents:
+    """
+    Concatenate the LogEvents of consecutive chunks of one log into a single
+    table, re-interning node IDs against a shared table and shifting the
+    trailer and diagnostic positions. Latencies are only resolved afterwards,
+    on the merged table, so a PUB in one chunk still resolves RECVs in later
+    chunks.
+    """
+    node_names = sorted(set(name for chunk in chunks for name in chunk.node_names))
+    global_ids = {name: i for i, name in enumerate(node_names)}
+    nodes, data_nodes, trailer, diagnostics = [], [], [], []
+    offset = 0
+    for chunk in chunks:
+        # Map every local ID to the global one; index -1 (no data node) is
+        # mapped to -1 through the extra entry at the end.
+        lookup = numpy.array([global_ids[name] for name in chunk.node_names] + [-1],
+                             dtype=numpy.int32)
+        nodes.append(lookup[chunk.node])
+        data_nodes.append(lookup[chunk.data_node])
+        trailer.extend((key, value, before + offset) for key, value, before in chunk.trailer)
+        diagnostics.append(DiagnosticEvents(
+            chunk.diagnostics.kind, chunk.diagnostics.time_ns, chunk.diagnostics.events_before + offset,
+            lookup[chunk.diagnostics.node], lookup[chunk.diagnostics.data_node],
+            chunk.diagnostics.seq, chunk.diagnostics.delta_ms))
+        offset += len(chunk)
+    time_ns = numpy.concatenate([chunk.time_ns for chunk in chunks])
+    diagnostics = DiagnosticEvents(*(numpy.concatenate([getattr(chunk, column) for chunk in diagnostics])
+                                     for column in DiagnosticEvents.COLUMNS))
+    # A diagnostic at the start of a chunk follows the last event of an
+    # earlier one
+    diagnostics.time_ns = _time_before(time_ns, diagnostics.events_before)
+    return LogEvents(node_names, time_ns,
+                     numpy.concatenate([chunk.action for chunk in chunks]),
+                     numpy.concatenate(nodes).astype(numpy.int32),
+                     numpy.concatenate(data_nodes).astype(numpy.int32),
+                     numpy.concatenate([chunk.seq for chunk in chunks]),
+                     numpy.concatenate([chunk.interest_type for chunk in chunks]),
+                     trailer, diagnostics=diagnostics)
+
+
+def parse_log_events_parallel(filepath, workers) -> LogEvents:
+    """
+    Split a log at line boundaries into `workers` chunks, parse them in a
+    process pool and merge the results. Compressed logs can't be split at
+    byte offsets, so they are parsed in one go.
+    """
+    bounds = _chunk_bounds(filepath, workers) if not log_compression(filepath) else []
+    if len(bounds) <= 1:
+        return parse_log_events(_map_log_file(filepath))
+    with ProcessPoolExecutor(max_workers=len(bounds)) as pool:
+        chunks = list(pool.map(_parse_log_chunk, [filepath] * len(bounds),
+                               *zip(*bounds)))
+    return merge_log_events(chunks)
+
+
+def read_log_events(filepath, sidecar=True, workers=1) -> LogEvents:
+    """
+    Memory-map a whole log file and parse its raw bytes into a LogEvents
+    table, in `workers` processes if there is more than one.
+
+    With `sidecar`, the table is loaded from (or, the first time, written to)
+    the columnar sidecar of the log instead of re-parsing the text.
+    """
+    if sidecar:
+        events = load_event_sidecar(filepath)
+        if events is not None:
+            return events
+    if workers > 1:
+        events = parse_log_events_parallel(filepath, workers)
+    else:
+        events = parse_log_events(_map_log_file(filepath))
+    if sidecar:
+        try:
+            write_event_sidecar(filepath, events)
+        except OSError as e:
+            print(f'Warning: could not write sidecar for {filepath}: {e}')
+    return events
+
+
+def read_log_diagnostics(filepath, sidecar=True, workers=1) -> dict:
+    """
+    The diagnostic lines of a log from a debug build of core.cpp, split by
+    kind into DiagnosticEvents tables: 'suppression' (entering suppression
+    state), 'outdated_ignored' (outdated entries within the network RTT) and
+    'outdated_accepted' (older than the RTT). Their node and data_node index
+    into 'node_names'. These come with the event sidecar, so after the first
+    read this costs no more than a scan of its kind column.
+    """
+    events = read_log_events(find_log_file(filepath) or filepath, sidecar, workers)
+    return {
+        'node_names': events.node_names,
+        'suppression': events.diagnostics.of_kind(DIAGNOSTIC_SUPPRESSION),
+        'outdated_ignored': events.diagnostics.of_kind(DIAGNOSTIC_OUTDATED_IGNORED),
+        'outdated_accepted': events.diagnostics.of_kind(DIAGNOSTIC_OUTDATED_ACCEPTED),
+    }
+
+
+def _message_keys(node: numpy.ndarray, seq: numpy.ndarray) -> numpy.ndarray:
+    """
+    Pack a (node, seq) pair into a single int64 so that pairs can be sorted,
+    grouped and compared with plain array operations.
+    """
+    return (node.astype(numpy.int64) << 32) | seq.astype(numpy.int64)
+
+
+class PublishResolution:
+    """
+    Result of _resolve_publish_times: the publish time every RECV event saw,
+    and every assignment publish_times[node][seq] = timestamp that the
+    line-by-line parser would have made, as (key, event index, value).
+
+    Resolution only ever looks backwards in the log, so the resolution of a
+    whole log is also valid for any prefix of it.
+    """
+    def __init__(self, recv_publish_times, assign_keys, assign_index, assign_values):
+        self.recv_publish_times = recv_publish_times
+        self.assign_keys = assign_keys
+        self.assign_index = assign_index
+        self.assign_values = assign_values
+
+    def final_publish_times(self, until) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        The message keys assigned by the events before `until`, and the last
+        publish time assigned to each.
+        """
+        made = self.assign_index < until
+        keys, index, values = self.assign_keys[made], self.assign_index[made], self.assign_values[made]
+        order = numpy.lexsort((index, keys))
+        last = numpy.concatenate((keys[order][1:] != keys[order][:-1], [True])) \
+            if len(order) else numpy.zeros(0, dtype=bool)
+        return keys[order][last], values[order][last]
+
+    def since(self, start, recvs_before) -> 'PublishResolution':
+        """
+        The resolution of the events from index `start` on (with
+        `recvs_before` RECVs before it), as _slice_events would slice them.
+        The assignments made before `start` are kept, at negative indices, so
+        that the publish times known at the start of the slice stay known.
+        """
+        return PublishResolution(self.recv_publish_times[recvs_before:], self.assign_keys,
+                                 self.assign_index - start, self.assign_values)
+
+
+def _resolve_publish_times(events: LogEvents, times: numpy.ndarray) -> PublishResolution:
+    """
+    Reproduce, with array operations, the publish time that the line-by-line
+    parser would have looked up for every RECV event, including the
+    INTEREST,PUBLISH correction for the first sequence number.
+    """
+    is_pub = events.action == ACTION_PUB
+    is_recv = events.action == ACTION_RECV
+    is_publish_interest = events.interest_type == INTEREST_PUBLISH
+    order = numpy.arange(len(events))
+
+    # len(publish_times[node]) at the time of each INTEREST,PUBLISH is the
+    # number of distinct sequence numbers that node has published so far.
+    # SVS sequence numbers start at 1, so the correction below never adds a
+    # key of its own.
+    pub_keys = _message_keys(events.node[is_pub], events.seq[is_pub])
+    _, first_pub = numpy.unique(pub_keys, return_index=True)
+    first_pub_index = order[is_pub][first_pub]
+    interest_index = order[is_publish_interest]
+    count_nodes = numpy.concatenate((events.node[first_pub_index], events.node[interest_index]))
+    count_index = numpy.concatenate((first_pub_index, interest_index))
+    count_is_pub = numpy.concatenate((numpy.ones(len(first_pub_index), dtype=numpy.int64),
+                                      numpy.zeros(len(interest_index), dtype=numpy.int64)))
+    count_order = numpy.lexsort((count_index, count_nodes))
+    sorted_is_pub = count_is_pub[count_order]
+    running = numpy.cumsum(sorted_is_pub)
+    if len(running):
+        sorted_nodes = count_nodes[count_order]
+        new_group = numpy.concatenate(([True], sorted_nodes[1:] != sorted_nodes[:-1]))
+        before_group = (running - sorted_is_pub)[new_group]
+        published_before = running - before_group[numpy.cumsum(new_group) - 1]
+    else:
+        published_before = running
+    corrects = count_order[(sorted_is_pub == 0) & (published_before == 1)]
+    correct_index = count_index[corrects]
+
+    # Every assignment publish_times[node][seq] = timestamp, in log order
+    assign_index = numpy.concatenate((order[is_pub], correct_index))
+    assign_keys = numpy.concatenate((
+        pub_keys,
+        _message_keys(events.node[correct_index], numpy.ones(len(correct_index), dtype=numpy.int64))))
+    assign_values = times[assign_index]
+
+    # Every RECV looks up the latest assignment to its key made before it
+    recv_index = order[is_recv]
+    recv_keys = _message_keys(events.data_node[is_recv], events.seq[is_recv])
+    keys = numpy.concatenate((assign_keys, recv_keys))
+    index = numpy.concatenate((assign_index, recv_index))
+    is_assign = numpy.concatenate((numpy.ones(len(assign_keys), dtype=bool),
+                                   numpy.zeros(len(recv_keys), dtype=bool)))
+    values = numpy.concatenate((assign_values, numpy.zeros(len(recv_keys))))
+    merged = numpy.lexsort((index, keys))
+    positions = numpy.arange(len(merged))
+    latest = numpy.maximum.accumulate(numpy.where(is_assign[merged], positions, -1)) \
+        if len(merged) else positions
+    query = ~is_assign[merged]
+    found = latest[query]
+    if numpy.any(found < 0) or numpy.any(keys[merged][numpy.maximum(found, 0)] != keys[merged][query]):
+        raise KeyError('RECV event for a message that was never published')
+    recv_publish_times = numpy.empty(len(recv_keys))
+    recv_publish_times[merged[query] - len(assign_keys)] = values[merged][found]
+    return PublishResolution(recv_publish_times, assign_keys, assign_index, assign_values)
+
+
+def _log_data_from_events(events: LogEvents, timespan=None, counted=None,
+                          resolution: PublishResolution = None, sample=None) -> LogData:
+    """
+    Compute the same LogData that the line-by-line parser produces, from a
+    LogEvents table.
+
+    If `counted` is given, only the events where it is True contribute to the
+    LogData; the others are only there so that RECVs can find the publish
+    times of messages published before them. `resolution` can be passed in
+    when it was already computed for these events (or a longer log they are
+    a prefix of). `sample` is the fraction of messages to keep the RECVs of,
+    for a preview (see read_log_file).
+    """
+    times = events.times()
+    # The line-by-line parser stops at the first event outside the timespan
+    cut = len(events)
+    if timespan:
+        min_time, max_time = timespan
+        outside = numpy.flatnonzero(~((min_time <= times) & (times <= max_time)))
+        if len(outside):
+            cut = int(outside[0])
+    if cut < len(events):
+        events = _slice_events(events, 0, cut)
+        times = times[:cut]
+        counted = None if counted is None else counted[:cut]
+    if counted is None:
+        counted = numpy.ones(len(events), dtype=bool)
+    names = events.node_names
+
+    is_data = (events.action != ACTION_INTEREST) & counted
+    is_recv = (events.action == ACTION_RECV) & counted
+    if sample is not None:
+        is_recv &= _sampled_messages(names, events.data_node, events.seq, sample)
+    nodes = set(names[i] for i in numpy.unique(events.node[is_data]).tolist())
+    message_keys = numpy.unique(_message_keys(events.node[is_data], events.seq[is_data]))
+    messages = set((names[key >> 32], key & 0xFFFFFFFF) for key in message_keys.tolist())
+    end_time = max(float(times[is_data].max()), 0) if numpy.any(is_data) else 0
+
+    sync_pack = sync_byte = mtu_size = 0
+    for key, value, before in events.trailer:
+        if before > cut:
+            continue
+        if key == 'SYNC_PACK':
+            sync_pack = value
+        elif key == 'SYNC_BYTE':
+            sync_byte = value
+        elif key == 'MTU_SIZE':
+            mtu_size = min(value, len(numpy.unique(events.node[:before][is_data[:before]])))
+
+    interest_counts = numpy.bincount(
+        events.interest_type[counted & (events.action == ACTION_INTEREST)], minlength=3)
+
+    if resolution is None:
+        resolution = _resolve_publish_times(events, times)
+    counted_until = int(numpy.flatnonzero(counted)[-1]) + 1 if numpy.any(counted) else 0
+    final_keys, final_values = resolution.final_publish_times(counted_until)
+    all_recvs = events.action == ACTION_RECV
+    recv_publish_times = resolution.recv_publish_times[:numpy.count_nonzero(all_recvs)][is_recv[all_recvs]]
+    publish_times = defaultdict(dict)
+    # The line-by-line parser touches publish_times[node] for these too
+    for node in numpy.unique(numpy.concatenate((
+            events.node[counted & (events.interest_type == INTEREST_PUBLISH)],
+            events.data_node[is_recv]))).tolist():
+        publish_times[names[node]]
+    for key, value in zip(final_keys.tolist(), final_values.tolist()):
+        publish_times[names[key >> 32]][key & 0xFFFFFFFF] = value
+
+    recv_table = RecvTable(names, events.data_node[is_recv].astype(numpy.int32),
+                           events.node[is_recv].astype(numpy.int32),
+                           events.seq[is_recv].astype(numpy.int32),
+                           recv_publish_times, times[is_recv])
+
+    log_data = LogData.from_recv_table(nodes, messages, publish_times, recv_table,
+                                       end_time, sync_pack, sync_byte, mtu_size,
+                                       int(interest_counts[INTEREST_PUBLISH]),
+                                       int(interest_counts[INTEREST_SUPPRESSION]),
+                                       int(interest_counts[INTEREST_PERIODIC]))
+    is_interest = counted & (events.action == ACTION_INTEREST)
+    log_data.interest_table = InterestTable(names, events.node[is_interest].astype(numpy.int32),
+                                            events.interest_type[is_interest], times[is_interest])
+    if sample is not None:
+        log_data.sample_fraction = sample
+    return log_data
+
+
+# Number of bytes read from the end of a log to find its trailer. The trailer
+# is three short lines, so this is plenty.
+TRAILER_TAIL_BYTES = 4096
+
+def read_log_trailer(filepath) -> dict:
+    """
+    Read the SYNC_PACK / SYNC_BYTE / MTU_SIZE trailer from the end of a log
+    without reading the rest of it. Keys missing from the trailer (e.g. when
+    the simulation didn't finish) are left out of the result.
+
+    The raw MTU_SIZE value is returned under 'MTU_SIZE'; LogData.mtu_size is
+    that value capped at the number of nodes. 'has_data' says whether the log
+    has any PUB or RECV line at all, since without one mtu_size is always 0.
+
+    A compressed log can't be read from the end, so it is decompressed whole.
+    If it was cut off, the trailer comes from whatever could be decompressed
+    and 'truncated' is set, which makes trailer_complete() False.
+    """
+    data = None
+    truncated = False
+    if log_compression(filepath):
+        data, truncated = _read_truncated_log_bytes(filepath)
+        size = len(data)
+        tail = data[-TRAILER_TAIL_BYTES:]
+    else:
+        with open(filepath, 'rb') as hdl:
+            size = os.fstat(hdl.fileno()).st_size
+            hdl.seek(max(size - TRAILER_TAIL_BYTES, 0))
+            tail = hdl.read()
+    lines = tail.split(b'\n')
+    if size > TRAILER_TAIL_BYTES:
+        # The first line is probably cut off
+        lines = lines[1:]
+    if truncated:
+        # And so is the last one
+        lines = lines[:-1]
+    trailer = {}
+    has_data = None
+    for line in reversed(lines):
+        # Skip empty lines and the debug output of core.cpp
+        if not line or line.startswith((b'(', b'/')):
+            continue
+        key = next((key for key, prefix in TRAILER_PREFIXES.items() if line.startswith(prefix)), None)
+        if key is None:
+            # Only the lines after the last event line count as the trailer
+            has_data = b',PUB,' in line or b',RECV,' in line
+            break
+        trailer.setdefault(key, int(line.split(b'=')[1]))
+    if not has_data and size:
+        # Rare: the last event is an INTEREST, so search the whole log
+        if data is not None:
+            has_data = data.find(b',PUB,') != -1 or data.find(b',RECV,') != -1
+        else:
+            with open(filepath, 'rb') as hdl:
+                with mmap.mmap(hdl.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    has_data = mapped.find(b',PUB,') != -1 or mapped.find(b',RECV,') != -1
+    trailer['has_data'] = bool(has_data)
+    if truncated:
+        trailer['truncated'] = True
+    return trailer
+
+
+def trailer_complete(trailer: dict) -> bool:
+    """
+    Whether LogData.complete() is True for the log `trailer` was read from.
+    """
+    # mtu_size is the MTU_SIZE of the trailer capped at the number of nodes,
+    # so it is only 0 when either of those is
+    return trailer.get('MTU_SIZE', 0) != 0 and trailer['has_data'] and not trailer.get('truncated', False)
+
+
+def scan_log_directory(directory, pattern='*-*') -> dict:
+    """
+    Read the trailer of every log in `directory` whose name matches `pattern`
+    and return {log path: trailer}, sorted by path. Every log name has a
+    strategy prefix (base-, randrec-, FULL_Method-, ...), so the default
+    pattern leaves out the plots and other files saved next to the logs.
+    """
+    logs = {}
+    for filepath in glob_logs(os.path.join(directory, pattern)):
+        if os.path.isfile(filepath):
+            logs[filepath] = read_log_trailer(filepath)
+    return logs
+
+
+def incomplete_logs(directory, pattern='*-*') -> List[str]:
+    """
+    The logs in `directory` that were cut off before the simulator printed
+    its trailer, e.g. because the simulation crashed or is still running.
+    """
+    return [filepath for filepath, trailer in scan_log_directory(directory, pattern).items()
+            if not trailer_complete(trailer)]
+
+
+def complete_logs(directory, pattern='*-*') -> List[str]:
+    """
+    The logs in `directory` that have their full trailer.
+    """
+    return [filepath for filepath, trailer in scan_log_directory(directory, pattern).items()
+            if trailer_complete(trailer)]
+
+
+def _count_interests(filepath) -> Tuple[int, int, int]:
+    """
+    Count the PUBLISH, SUPPRESSION and PERIODIC sync interests of a log by
+    searching its bytes, without parsing any line.
+    """
+    data = _read_log_bytes(filepath)
+    return tuple(data.count(b',INTEREST,' + INTEREST_TYPE_NAMES[interest_type])
+                 for interest_type in (INTEREST_PUBLISH, INTEREST_SUPPRESSION, INTEREST_PERIODIC))
+
+
+class LazyLogData(LogData):
+    """
+    A LogData for a whole log that reads only as much of the file as the
+    attributes used so far need. The attributes are loaded in three tiers, on
+    first access:
+
+    1.  trailer:  sync_pack and sync_bytes, read from the end of the file.
+                  complete() is answered from this tier too.
+    2.  counters: the number of sync interests of each type, counted in the
+                  raw bytes of the file.
+    3.  tables:   everything else (nodes, messages, publish/receive times,
+                  latencies, ...), computed by the numpy engine.
+
+    Once loaded, a tier is stored in the instance like a regular LogData
+    attribute, so it costs nothing the second time.
+    """
+    TIERS = {
+        'sync_pack': 'trailer',
+        'sync_bytes': 'trailer',
+        'num_publish_interests': 'counters',
+        'num_suppression_interests': 'counters',
+        'num_periodic_interests': 'counters',
+        'nodes': 'tables',
+        'messages': 'tables',
+        'publish_times': 'tables',
+        'receive_times': 'tables',
+        'latencies': 'tables',
+        'end_time': 'tables',
+        'mtu_size': 'tables',
+        'recv_table': 'tables',
+        'interest_table': 'tables',
+    }
+
+    def __init__(self, filepath, sidecar=True, workers=1, sample=None):
+        # Deliberately not calling LogData.__init__: every data attribute is
+        # loaded on demand by __getattr__
+        self.filepath = filepath
+        self.sidecar = sidecar
+        self.workers = workers
+        self.sample = sample
+        self.sample_fraction = sample if sample is not None else 1
+        self.loaded_tiers = set()
+        self._derived = {}
+        self._trailer = None
+        self.latency_sketch = None
+        self.num_received_messages = None
+
+    def __getattr__(self, name):
+        # Only called when `name` isn't set yet
+        tier = LazyLogData.TIERS.get(name)
+        if tier is None or tier in self.__dict__.get('loaded_tiers', ()):
+            raise AttributeError(name)
+        self.load_tier(tier)
+        return self.__dict__[name]
+
+    def _get_trailer(self) -> dict:
+        if self._trailer is None:
+            self._trailer = read_log_trailer(self.filepath)
+        return self._trailer
+
+    def load_tier(self, tier):
+        """
+        Load every attribute of `tier` ('trailer', 'counters' or 'tables').
+        """
+        if tier == 'trailer':
+            trailer = self._get_trailer()
+            self.sync_pack = trailer.get('SYNC_PACK', 0)
+            self.sync_bytes = trailer.get('SYNC_BYTE', 0)
+        elif tier == 'counters':
+            (self.num_publish_interests, self.num_suppression_interests,
+             self.num_periodic_interests) = _count_interests(self.filepath)
+        elif tier == 'tables':
+            log_data = _log_data_from_events(
+                read_log_events(self.filepath, self.sidecar, self.workers), sample=self.sample)
+            for name, name_tier in LazyLogData.TIERS.items():
+                if name_tier == 'tables':
+                    setattr(self, name, getattr(log_data, name))
+        else:
+            raise Exception(f'Unknown LogData tier "{tier}"')
+        self.loaded_tiers.add(tier)
+
+    def complete(self) -> bool:
+        return trailer_complete(self._get_trailer())
+
 
-def read_log_file(filepath, timespan=None) -> LogData:
+def read_log_file(filepath, timespan=None, engine='python', sidecar=True,
+                  workers=1, latency_sketch: LatencySketch = None, sample=None) -> LogData:
     print(filepath)
+    filepath = find_log_file(filepath) or filepath
     """
     Read the log file and collect some very basic data about it for further
     analysis.
+
+    `engine` selects the parser: 'python' goes through the file line by line,
+    'numpy' reads it in bulk into a LogEvents table and computes the same
+    LogData with array operations. The numpy engine caches that table in a
+    columnar sidecar next to the log unless `sidecar` is False, and splits
+    the parse over `workers` processes for very large logs. 'lazy' returns a
+    LazyLogData that only reads what the attributes used need; it is only
+    lazy for the whole log, with a timespan it is the same as 'numpy'.
+
+    If a `latency_sketch` is given, every latency is added to it and the
+    returned LogData keeps it as `latency_sketch`. With the python engine the
+    latencies are then not kept at all (`receive_times` and `latencies` stay
+    empty), so the memory used no longer grows with the number of RECVs;
+    only the number of messages received is counted, for
+    total_pubs_per_second. The metrics that need every latency of every
+    message (latency_percentile_averages and the like) then raise an
+    exception. The other engines still build their tables and fill the
+    sketch from them.
+
+    Logs stored compressed (see open_log_file) are read transparently, also
+    when `filepath` is given without the compression suffix.
+
+    `sample` (between 0 and 1) makes a quick preview: only the RECVs of that
+    fraction of the messages are processed, chosen deterministically with
+    message_sampled. The latency metrics of the LogData are then estimates,
+    see latency_percentile_average_intervals and
+    _90th_percentile_latency_interval for their confidence intervals.
+
+    'outofcore' is for logs that don't fit in memory: it returns a LogSummary
+    (see summarize_log_out_of_core) with the same metrics, but no tables.
     """
+    if engine == 'outofcore':
+        if timespan or latency_sketch is not None or sample is not None:
+            raise Exception('The out-of-core engine only summarizes whole logs')
+        return summarize_log_out_of_core(filepath)
+    if engine in ('numpy', 'lazy') and latency_sketch is not None:
+        log_data = _log_data_from_events(read_log_events(filepath, sidecar, workers), timespan,
+                                         sample=sample)
+        latency_sketch.add_many(log_data.recv_table.latencies())
+        log_data.latency_sketch = latency_sketch
+        return log_data
+    if engine == 'lazy' and not timespan:
+        return LazyLogData(filepath, sidecar, workers, sample)
+    if engine in ('numpy', 'lazy'):
+        return _log_data_from_events(read_log_events(filepath, sidecar, workers), timespan,
+                                     sample=sample)
+    elif engine != 'python':
+        raise Exception(f'Unknown log engine "{engine}"')
+
     # The timespan we want to analyze in the log file. By default it is the
     # entire log file.
     if timespan:
@@ -110,19 +2470,29 @@ def read_log_file(filepath, timespan=None) -> LogData:
     num_publish_interests = 0
     num_suppression_interests = 0
     num_periodic_interests = 0
-    with open(filepath, 'r') as hdl:
+    # The messages received, which `latencies` doesn't keep with a sketch
+    received = set()
+    # The messages a preview keeps, hashed once when they are published
+    sampled = set()
+    with open_log_file(filepath) as hdl:
         for line in hdl:
-            # Edge case: end of the file, printing stats and stuff.
-            if line.startswith('SYNC'):
-                val = int(line.split('=')[1])
-                if line.startswith('SYNC_PACK'):
-                    sync_pack = val
-                if line.startswith('SYNC_BYTE'):
-                    sync_byte = val
-                continue
-            if line.startswith('MTU_SIZE'):
-                mtu_size = min(int(line.split('=')[1]), len(nodes))
-                continue
+            # Event lines start with their timestamp, so only the others need
+            # a closer look
+            if not line[:1].isdigit():
+                # Edge case: end of the file, printing stats and stuff.
+                if line.startswith('SYNC'):
+                    val = int(line.split('=')[1])
+                    if line.startswith('SYNC_PACK'):
+                        sync_pack = val
+                    if line.startswith('SYNC_BYTE'):
+                        sync_byte = val
+                    continue
+                if line.startswith('MTU_SIZE'):
+                    mtu_size = min(int(line.split('=')[1]), len(nodes))
+                    continue
+                # Debug output of core.cpp, see DiagnosticEvents
+                if line.startswith(('(', '/')):
+                    continue
 
             line = line.split(',')
             timestamp = float(line[0])
@@ -175,17 +2545,1247 @@ def read_log_file(filepath, timespan=None) -> LogData:
 
                 if action == 'PUB':
                     publish_times[node][seq_number] = timestamp
+                    if sample is not None and message_sampled(node, seq_number, sample):
+                        sampled.add((node, seq_number))
                 elif action == 'RECV':
-                    receive_times[node][data_node][seq_number] = timestamp
+                    if sample is not None and (data_node, seq_number) not in sampled:
+                        continue
                     latency = timestamp - publish_times[data_node][seq_number]
-                    latencies[(data_node, seq_number)].append(latency)
+                    if latency_sketch is not None:
+                        latency_sketch.add(latency)
+                        received.add((data_node, seq_number))
+                    else:
+                        receive_times[node][data_node][seq_number] = timestamp
+                        latencies[(data_node, seq_number)].append(latency)
                 else:
                     raise Exception('Unrecognized message!')
 
-    return LogData(nodes, messages, publish_times, receive_times, latencies,
-                   end_time, sync_pack, sync_byte, mtu_size,
-                   num_publish_interests, num_suppression_interests, 
-                   num_periodic_interests)
+    log_data = LogData(nodes, messages, publish_times, receive_times, latencies,
+                       end_time, sync_pack, sync_byte, mtu_size,
+                       num_publish_interests, num_suppression_interests,
+                       num_periodic_interests)
+    log_data.latency_sketch = latency_sketch
+    if latency_sketch is not None:
+        log_data.num_received_messages = len(received)
+    # The interest table is only read if it is used
+    log_data.interest_source = (filepath, timespan, None, sidecar)
+    if sample is not None:
+        log_data.sample_fraction = sample
+    return log_data
+
+
+def parse_legacy_log_name(filepath) -> dict:
+    """
+    Parse the name of a log written by the experiments of gen_exp.py, e.g.
+    FULL_Method-4_Row-4_Col-1000_MS_INTER_SLOW-...-4_MTU.log, into a dict of
+    its parameters (see LEGACY_LOG_PARAMETERS). Named topologies (6node,
+    butterfly, ...) are under 'topology'. The logs in results/ (10rand, ...)
+    only give 'random_to_include'. Returns an empty dict if the name follows
+    neither scheme.
+    """
+    name = os.path.basename(filepath)
+    compression = log_compression(name)
+    if compression:
+        name = name[:-len(LOG_COMPRESSION_SUFFIXES[compression])]
+    if name.endswith('.log'):
+        name = name[:-len('.log')]
+    match = LEGACY_RESULTS_LOG_NAME.fullmatch(name)
+    if match:
+        return {'random_to_include': int(match.group(1))}
+    parameters = {}
+    for field in name.split('-'):
+        for suffix, (key, cast) in LEGACY_LOG_PARAMETERS.items():
+            if field.endswith(suffix):
+                parameters[key] = cast(field[:-len(suffix)])
+                break
+        else:
+            parameters['topology'] = field
+    if 'method' not in parameters:
+        return {}
+    return parameters
+
+
+def _read_legacy_log(filepath, sidecar) -> Tuple[dict, LogData]:
+    return parse_legacy_log_name(filepath), read_log_file(filepath, engine='numpy', sidecar=sidecar)
+
+
+def read_legacy_logs(directory, pattern=LEGACY_LOG_PATTERNS, workers=None, sidecar=True) -> dict:
+    """
+    Read every gen_exp.py log in `directory` (exp_log_files/, results/, ...)
+    with the numpy engine, spread over `workers` processes (by default one
+    per CPU). `pattern` is a glob pattern or a list of them; the default
+    matches FULL_Method-...log and the <N>rand logs of results/, but not the
+    scripts and notes next to them. Returns {log path: (parameters,
+    LogData)} sorted by path, with the parameters parsed by
+    parse_legacy_log_name.
+    """
+    patterns = [pattern] if isinstance(pattern, str) else pattern
+    logs = sorted({filepath for pattern in patterns
+                   for filepath in glob_logs(os.path.join(directory, pattern))
+                   if os.path.isfile(filepath)})
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(logs) <= 1:
+        return {filepath: _read_legacy_log(filepath, sidecar) for filepath in logs}
+    with ProcessPoolExecutor(max_workers=min(workers, len(logs))) as pool:
+        return dict(zip(logs, pool.map(_read_legacy_log, logs, [sidecar] * len(logs))))
+
+
+def build_time_index(filepath) -> dict:
+    """
+    Build and persist the sparse time index of a log. Every TIME_INDEX_STRIDE
+    events it records the byte offset of the event line, the latest timestamp
+    before it and the earliest timestamp from it onwards, so that a window can
+    be located without assuming that timestamps never go backwards. It also
+    keeps every PUB and INTEREST,PUBLISH event, which is all that is needed to
+    resolve the publish times of RECVs inside any window.
+    """
+    buf = _map_log_file(filepath)
+    events = parse_log_events(buf)
+    times = events.times()
+    # The last entry points just past the last event line, at the trailer
+    end_of_events = 0
+    if len(events):
+        newlines = numpy.flatnonzero(buf[events.offsets[-1]:] == ord('\n'))
+        end_of_events = int(events.offsets[-1] + newlines[0] + 1) if len(newlines) else len(buf)
+    entries = numpy.arange(0, len(events), TIME_INDEX_STRIDE)
+    prefix_max = numpy.maximum.accumulate(times) if len(times) else times
+    suffix_min = numpy.minimum.accumulate(times[::-1])[::-1] if len(times) else times
+    is_publish = (events.action == ACTION_PUB) | (events.interest_type == INTEREST_PUBLISH)
+    index = {
+        'offsets': numpy.append(events.offsets[entries], end_of_events),
+        'prefix_max': numpy.append(numpy.concatenate(([-numpy.inf], prefix_max[entries[1:] - 1])),
+                                   prefix_max[-1] if len(times) else -numpy.inf),
+        'suffix_min': numpy.append(suffix_min[entries], numpy.inf),
+        'node_names': numpy.array(events.node_names, dtype=str),
+        'publish_time_ns': events.time_ns[is_publish],
+        'publish_action': events.action[is_publish],
+        'publish_node': events.node[is_publish],
+        'publish_data_node': events.data_node[is_publish],
+        'publish_seq': events.seq[is_publish],
+        'publish_interest_type': events.interest_type[is_publish],
+        'publish_offset': events.offsets[is_publish],
+    }
+    try:
+        _save_sidecar(_sidecar_path(filepath, TIME_INDEX_SUFFIX), index,
+                      {'version': SIDECAR_VERSION, 'signature': _file_signature(filepath)})
+    except OSError as e:
+        print(f'Warning: could not write time index for {filepath}: {e}')
+    return index
+
+
+def load_time_index(filepath) -> dict:
+    """
+    Load the persisted time index of a log, building it first if it is
+    missing or stale.
+    """
+    index, meta = _load_sidecar(_sidecar_path(filepath, TIME_INDEX_SUFFIX))
+    if index is None or meta.get('version') != SIDECAR_VERSION or \
+            meta.get('signature') != _file_signature(filepath):
+        index = build_time_index(filepath)
+    return index
+
+
+def read_log_window(filepath, timespan) -> LogData:
+    """
+    Read only the events with min_time <= timestamp <= max_time, seeking
+    straight to them through the time index of the log.
+
+    Unlike `read_log_file(filepath, timespan)`, which stops at the first event
+    outside of the timespan, this is a proper window: RECVs inside it use the
+    publish times of messages published before it, and the trailer counters
+    are only filled in if the window reaches the end of the log.
+    """
+    print(filepath)
+    min_time, max_time = timespan
+    index = load_time_index(filepath)
+    # Every event before `start` is earlier than the window and every event
+    # from `stop` onwards is later than it
+    buf = _map_log_file(filepath)
+    start = index['offsets'][max(numpy.searchsorted(index['prefix_max'], min_time, 'left') - 1, 0)]
+    stop = numpy.searchsorted(index['suffix_min'], max_time, 'right')
+    stop = index['offsets'][stop] if stop < len(index['offsets']) - 1 else len(buf)
+    region = parse_log_events(buf[start:stop])
+
+    before = index['publish_offset'] < start
+    context = LogEvents(index['node_names'].tolist(), index['publish_time_ns'][before],
+                        index['publish_action'][before], index['publish_node'][before],
+                        index['publish_data_node'][before], index['publish_seq'][before],
+                        index['publish_interest_type'][before], [])
+    events = merge_log_events([context, region])
+    return _window_log_data(events, events.times(), min_time, max_time,
+                            numpy.arange(len(events)) >= len(context))
+
+
+def _window_log_data(events: LogEvents, times: numpy.ndarray, min_time, max_time,
+                     candidates=None) -> LogData:
+    """
+    LogData of the events with min_time <= timestamp <= max_time (among the
+    `candidates`, if given). The trailer is only printed after the last
+    event, so it only counts if no event comes after the window.
+    """
+    counted = (min_time <= times) & (times <= max_time)
+    if candidates is not None:
+        counted &= candidates
+    if numpy.any(times > max_time):
+        events = LogEvents(events.node_names, events.time_ns, events.action, events.node,
+                           events.data_node, events.seq, events.interest_type, [],
+                           events.offsets)
+    return _log_data_from_events(events, counted=counted)
+
+
+def _first_occurrences(values: numpy.ndarray, positions: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    The distinct `values` in the order they first appear, and the (sorted)
+    `positions` where they first do.
+    """
+    unique, first = numpy.unique(values, return_index=True)
+    order = numpy.argsort(first, kind='stable')
+    return unique[order], positions[first[order]]
+
+
+class _LogPrefixes:
+    """
+    The LogData of every prefix of a log, as read_log_file(filepath, (0,
+    max_time)) would give it, from one pass of array operations over the
+    whole table. Everything a prefix needs is either counted by where things
+    first appear (nodes, messages) or a slice of a column in log order (RECVs,
+    interests, publish time assignments), so a cutoff only costs a few binary
+    searches plus building the dicts of its LogData.
+    """
+    def __init__(self, events: LogEvents, times: numpy.ndarray, resolution: PublishResolution):
+        self.events = events
+        self.names = events.node_names
+        # The line-by-line parser stops at the first event outside (0,
+        # max_time), i.e. at the first negative timestamp or the first one
+        # past max_time
+        negative = numpy.flatnonzero(times < 0)
+        self.first_negative = int(negative[0]) if len(negative) else len(events)
+        self.prefix_max = numpy.maximum.accumulate(times) if len(times) else times
+
+        order = numpy.arange(len(events))
+        data_index = numpy.flatnonzero(events.action != ACTION_INTEREST)
+        self.data_index = data_index
+        self.data_prefix_max = numpy.maximum.accumulate(times[data_index]) if len(data_index) \
+            else times[data_index]
+        self.node_order, self.node_first = _first_occurrences(events.node[data_index], order[data_index])
+        message_keys, self.message_first = _first_occurrences(
+            _message_keys(events.node[data_index], events.seq[data_index]), order[data_index])
+        self.messages = [(self.names[key >> 32], key & 0xFFFFFFFF) for key in message_keys.tolist()]
+
+        self.interest_index = numpy.flatnonzero(events.action == ACTION_INTEREST)
+        self.interest_type_index = [self.interest_index[events.interest_type[self.interest_index] == interest_type]
+                                    for interest_type in (INTEREST_PUBLISH, INTEREST_SUPPRESSION,
+                                                          INTEREST_PERIODIC)]
+        self.interest_table = InterestTable(self.names, events.node[self.interest_index].astype(numpy.int32),
+                                            events.interest_type[self.interest_index],
+                                            times[self.interest_index])
+
+        is_recv = events.action == ACTION_RECV
+        self.recv_index = numpy.flatnonzero(is_recv)
+        self.recv_table = RecvTable(self.names, events.data_node[is_recv].astype(numpy.int32),
+                                    events.node[is_recv].astype(numpy.int32),
+                                    events.seq[is_recv].astype(numpy.int32),
+                                    resolution.recv_publish_times[:len(self.recv_index)], times[is_recv])
+
+        # The line-by-line parser touches publish_times[node] for the nodes
+        # sending an INTEREST,PUBLISH and the publishers of RECVs
+        publish_interests = self.interest_type_index[INTEREST_PUBLISH]
+        touch_index = numpy.concatenate((publish_interests, self.recv_index))
+        touch_order = numpy.argsort(touch_index, kind='stable')
+        self.touched_order, self.touched_first = _first_occurrences(
+            numpy.concatenate((events.node[publish_interests], events.data_node[is_recv]))[touch_order],
+            touch_index[touch_order])
+        # Every publish_times assignment, in log order, so that the last one
+        # to a key wins
+        assign_order = numpy.argsort(resolution.assign_index, kind='stable')
+        self.assign_index = resolution.assign_index[assign_order]
+        self.assign_keys = resolution.assign_keys[assign_order].tolist()
+        self.assign_values = resolution.assign_values[assign_order].tolist()
+
+    def log_data(self, max_time) -> LogData:
+        events = self.events
+        names = self.names
+        cut = min(self.first_negative, int(numpy.searchsorted(self.prefix_max, max_time, 'right')))
+        num_data = int(numpy.searchsorted(self.data_index, cut))
+
+        nodes = set(names[node] for node in
+                    self.node_order[:numpy.searchsorted(self.node_first, cut)].tolist())
+        messages = set(self.messages[:numpy.searchsorted(self.message_first, cut)])
+        end_time = max(float(self.data_prefix_max[num_data - 1]), 0) if num_data else 0
+
+        sync_pack = sync_byte = mtu_size = 0
+        for key, value, before in events.trailer:
+            if before > cut:
+                continue
+            if key == 'SYNC_PACK':
+                sync_pack = value
+            elif key == 'SYNC_BYTE':
+                sync_byte = value
+            elif key == 'MTU_SIZE':
+                mtu_size = min(value, int(numpy.searchsorted(self.node_first, before)))
+
+        publish_times = defaultdict(dict)
+        for node in self.touched_order[:numpy.searchsorted(self.touched_first, cut)].tolist():
+            publish_times[names[node]]
+        for i in range(int(numpy.searchsorted(self.assign_index, cut))):
+            key = self.assign_keys[i]
+            publish_times[names[key >> 32]][key & 0xFFFFFFFF] = self.assign_values[i]
+
+        num_recvs = int(numpy.searchsorted(self.recv_index, cut))
+        table = self.recv_table
+        recv_table = RecvTable(names, table.publisher[:num_recvs], table.receiver[:num_recvs],
+                               table.seq[:num_recvs], table.publish_ts[:num_recvs],
+                               table.recv_ts[:num_recvs])
+        interest_counts = [int(numpy.searchsorted(index, cut)) for index in self.interest_type_index]
+        log_data = LogData.from_recv_table(nodes, messages, publish_times, recv_table,
+                                           end_time, sync_pack, sync_byte, mtu_size,
+                                           interest_counts[INTEREST_PUBLISH],
+                                           interest_counts[INTEREST_SUPPRESSION],
+                                           interest_counts[INTEREST_PERIODIC])
+        num_interests = int(numpy.searchsorted(self.interest_index, cut))
+        interests = self.interest_table
+        log_data.interest_table = InterestTable(names, interests.node[:num_interests],
+                                                interests.interest_type[:num_interests],
+                                                interests.ts[:num_interests])
+        return log_data
+
+
+def read_log_windows(filepath, windows, sidecar=True) -> List[LogData]:
+    """
+    Compute one LogData per window from a single read of the log. Every
+    window is either
+    -   a (min_time, max_time) tuple, with the same meaning as in
+        read_log_window, or
+    -   a single max_time cutoff, giving exactly what
+        read_log_file(filepath, (0, max_time)) gives.
+
+    The log is parsed (or loaded from its sidecar) and its publish times are
+    resolved once, whatever the number of windows. The cutoffs are then cut
+    out of those tables (see _LogPrefixes) rather than recomputed, and the
+    events of a (min_time, max_time) window are found by binary search in
+    the events sorted by time, so that only the stretch of the log between
+    its first and last event is looked at.
+    """
+    print(filepath)
+    events = read_log_events(filepath, sidecar)
+    times = events.times()
+    resolution = _resolve_publish_times(events, times)
+    prefixes = None
+    by_time = None
+    results = []
+    for window in windows:
+        if isinstance(window, tuple):
+            if by_time is None:
+                # Timestamps can go backwards a little, so sort them rather
+                # than searching the log order
+                by_time = numpy.argsort(times, kind='stable')
+                sorted_times = times[by_time]
+                recvs_before = numpy.concatenate(([0], numpy.cumsum(events.action == ACTION_RECV)))
+            min_time, max_time = window
+            inside = by_time[numpy.searchsorted(sorted_times, min_time, 'left'):
+                             numpy.searchsorted(sorted_times, max_time, 'right')]
+            if len(inside) == 0:
+                # Nothing to slice, and nothing to save either
+                results.append(_window_log_data(events, times, min_time, max_time))
+                continue
+            start, stop = int(inside.min()), int(inside.max()) + 1
+            window_events = _slice_events(events, start, stop)
+            if sorted_times[-1] > max_time:
+                # Some event comes after the window, so the trailer doesn't count
+                window_events.trailer = []
+            counted = (min_time <= times[start:stop]) & (times[start:stop] <= max_time)
+            results.append(_log_data_from_events(
+                window_events, counted=counted,
+                resolution=resolution.since(start, int(recvs_before[start]))))
+        else:
+            if prefixes is None:
+                prefixes = _LogPrefixes(events, times, resolution)
+            results.append(prefixes.log_data(window))
+    return results
+
+
+# Size of the pieces a log is parsed in by the out-of-core engine
+OUT_OF_CORE_CHUNK_BYTES = 64 * 1024 * 1024
+# How much memory aggregating one spilled partition may take. The number of
+# partitions is derived from it: aggregating takes about this many bytes per
+# spilled event (measured at ~80), and a log line is about this long.
+OUT_OF_CORE_MEMORY_BUDGET = 256 * 1024 * 1024
+OUT_OF_CORE_BYTES_PER_EVENT = 128
+OUT_OF_CORE_LOG_BYTES_PER_EVENT = 32
+# Every partition is 7 open files while spilling, so don't make too many
+OUT_OF_CORE_MAX_PARTITIONS = 64
+# The columns of a spilled partition
+SPILL_COLUMNS = {
+    'index': numpy.int64,
+    'time_ns': numpy.int64,
+    'action': numpy.int8,
+    'node': numpy.int32,
+    'data_node': numpy.int32,
+    'seq': numpy.int32,
+    'interest_type': numpy.int8,
+}
+SPILL_ROW_BYTES = sum(numpy.dtype(dtype).itemsize for dtype in SPILL_COLUMNS.values())
+
+class LogSummary:
+    """
+    The metrics of a LogData without the tables they are computed from, as
+    returned by the out-of-core engine. It answers the same questions that
+    the plots ask a LogData (percentile averages, the 90th percentile latency,
+    publications per second, overhead counters, complete()), with exactly the
+    same values.
+    """
+    def __init__(self, nodes, end_time, num_messages, sync_pack, sync_bytes, mtu_size,
+                 num_publish_interests, num_suppression_interests, num_periodic_interests,
+                 percentile_averages, percentile90):
+        self.nodes = nodes
+        self.end_time = end_time
+        # The number of messages that were received at least once, i.e.
+        # len(LogData.latencies)
+        self.num_messages = num_messages
+        self.sync_pack = sync_pack
+        self.sync_bytes = sync_bytes
+        self.mtu_size = mtu_size
+        self.num_publish_interests = num_publish_interests
+        self.num_suppression_interests = num_suppression_interests
+        self.num_periodic_interests = num_periodic_interests
+        self._percentile_averages = percentile_averages
+        self._percentile90 = percentile90
+
+    def latency_percentile_averages(self) -> Tuple[float, float, float]:
+        return self._percentile_averages
+
+    def _90th_percentile_latency(self) -> float:
+        return self._percentile90
+
+    def total_pubs_per_second(self) -> float:
+        return self.num_messages / (self.end_time / 1000)
+
+    def complete(self) -> bool:
+        return self.mtu_size != 0
+
+
+def _kth_smallest(runs: List[numpy.ndarray], k) -> float:
+    """
+    The k-th smallest value (counting from 0) over several sorted arrays,
+    which can be memory-mapped from disk; only O(log) of their elements are
+    ever looked at.
+    """
+    lo = [0] * len(runs)
+    hi = [len(run) for run in runs]
+    while True:
+        # Pivot on the middle of the largest range the answer can still be in
+        widest = max(range(len(runs)), key=lambda i: hi[i] - lo[i])
+        pivot = runs[widest][(lo[widest] + hi[widest]) // 2]
+        less = [int(numpy.searchsorted(run, pivot, 'left')) for run in runs]
+        less_or_equal = [int(numpy.searchsorted(run, pivot, 'right')) for run in runs]
+        if k < sum(less):
+            hi = [min(h, n) for h, n in zip(hi, less)]
+        elif k >= sum(less_or_equal):
+            lo = [max(l, n) for l, n in zip(lo, less_or_equal)]
+        else:
+            return pivot
+
+
+def _external_percentile(runs: List[numpy.ndarray], percentile) -> float:
+    """
+    numpy.percentile of all the values in several sorted arrays together,
+    without concatenating them, with the same arithmetic as numpy.
+    """
+    count = sum(len(run) for run in runs)
+    if count == 0:
+        # Fail (or not) exactly like numpy does
+        return numpy.percentile(numpy.zeros(0), percentile)
+    counts = numpy.array([count])
+    virtual = (counts - 1) * numpy.true_divide(percentile, 100)
+    previous = numpy.floor(virtual)
+    previous_index = min(int(previous[0]), count - 1)
+    next_index = min(int(previous[0]) + 1, count - 1)
+    # The two order statistics around the percentile are all it needs
+    below = numpy.array([_kth_smallest(runs, previous_index)], dtype=numpy.float64)
+    above = below if next_index == previous_index else \
+        numpy.array([_kth_smallest(runs, next_index)], dtype=numpy.float64)
+    return _lerp(below, above, virtual - previous)[0]
+
+
+def _spill_log_events(filepath, directory, partitions, chunk_bytes) -> dict:
+    """
+    Parse a log piece by piece and append its events to `partitions` sets of
+    column files in `directory`, partitioned by publisher: every PUB and
+    INTEREST goes to the partition of its node, every RECV to the partition of
+    the node that published the message. Also collects everything that is
+    cheap to keep in memory (node names, trailer, counters).
+    """
+    node_ids = {}
+    nodes_seen = set()
+    summary = {'end_time': 0, 'trailer': {}, 'interest_counts': numpy.zeros(3, dtype=numpy.int64)}
+    files = [{column: open(os.path.join(directory, f'{partition}.{column}'), 'wb')
+              for column in SPILL_COLUMNS} for partition in range(partitions)]
+    offset = 0
+    try:
+        for data in _iter_log_chunks(filepath, chunk_bytes):
+            chunk = parse_log_events(data)
+            for name in chunk.node_names:
+                node_ids.setdefault(name, len(node_ids))
+            lookup = numpy.array([node_ids[name] for name in chunk.node_names] + [-1], dtype=numpy.int32)
+            node = lookup[chunk.node]
+            data_node = lookup[chunk.data_node]
+            times = chunk.times()
+            is_data = chunk.action != ACTION_INTEREST
+            if numpy.any(is_data):
+                summary['end_time'] = max(summary['end_time'], float(times[is_data].max()))
+            for key, value, before in chunk.trailer:
+                if key == 'MTU_SIZE':
+                    value = min(value, len(nodes_seen | set(node[:before][is_data[:before]].tolist())))
+                summary['trailer'][key] = value
+            nodes_seen.update(numpy.unique(node[is_data]).tolist())
+            summary['interest_counts'] += numpy.bincount(
+                chunk.interest_type[~is_data], minlength=3)[:3]
+
+            publisher = numpy.where(chunk.action == ACTION_RECV, data_node, node)
+            partition = publisher % partitions
+            columns = {
+                'index': numpy.arange(offset, offset + len(chunk), dtype=numpy.int64),
+                'time_ns': chunk.time_ns,
+                'action': chunk.action,
+                'node': node,
+                'data_node': data_node,
+                'seq': chunk.seq,
+                'interest_type': chunk.interest_type,
+            }
+            order = numpy.argsort(partition, kind='stable')
+            bounds = numpy.searchsorted(partition[order], numpy.arange(partitions + 1))
+            for p in range(partitions):
+                rows = order[bounds[p]:bounds[p + 1]]
+                for column, dtype in SPILL_COLUMNS.items():
+                    columns[column][rows].astype(dtype).tofile(files[p][column])
+            offset += len(chunk)
+    finally:
+        for partition_files in files:
+            for hdl in partition_files.values():
+                hdl.close()
+    names = sorted(node_ids, key=node_ids.get)
+    summary['node_names'] = names
+    summary['nodes'] = set(names[i] for i in nodes_seen)
+    return summary
+
+
+def _out_of_core_partitions(filepath, memory_budget) -> int:
+    """
+    How many partitions to spill a log to so that each fits in
+    `memory_budget`, going by the size of the file. Compressed logs are
+    larger than that once decompressed, but _split_partition takes care of
+    partitions that turn out too large anyway.
+    """
+    events = os.path.getsize(filepath) / OUT_OF_CORE_LOG_BYTES_PER_EVENT
+    return min(max(1, math.ceil(events * OUT_OF_CORE_BYTES_PER_EVENT / memory_budget)),
+               OUT_OF_CORE_MAX_PARTITIONS)
+
+
+def _split_partition(directory, partition, memory_budget, chunk_bytes) -> List[str]:
+    """
+    Split a spilled partition that is too large to aggregate within
+    `memory_budget` (e.g. the partition of a hub that publishes most of the
+    messages) into smaller ones, by sequence number. Every part gets the RECVs
+    of its own messages and all the PUBs and INTERESTs of the partition,
+    which are few next to the RECVs, so that the publish times still resolve
+    exactly. Returns the names of the partitions to aggregate.
+    """
+    rows = os.path.getsize(os.path.join(directory, f'{partition}.index')) // 8
+    parts = min(math.ceil(rows * OUT_OF_CORE_BYTES_PER_EVENT / memory_budget), OUT_OF_CORE_MAX_PARTITIONS)
+    if parts <= 1:
+        return [partition]
+    names = [f'{partition}-{part}' for part in range(parts)]
+    files = [{column: open(os.path.join(directory, f'{name}.{column}'), 'wb')
+              for column in SPILL_COLUMNS} for name in names]
+    chunk_rows = max(chunk_bytes // SPILL_ROW_BYTES, 1)
+    try:
+        for start in range(0, rows, chunk_rows):
+            columns = {column: numpy.fromfile(os.path.join(directory, f'{partition}.{column}'), dtype=dtype,
+                                              count=chunk_rows, offset=start * numpy.dtype(dtype).itemsize)
+                       for column, dtype in SPILL_COLUMNS.items()}
+            is_recv = columns['action'] == ACTION_RECV
+            part = columns['seq'] % parts
+            for i in range(parts):
+                rows_of_part = ~is_recv | (part == i)
+                for column in SPILL_COLUMNS:
+                    columns[column][rows_of_part].tofile(files[i][column])
+    finally:
+        for part_files in files:
+            for hdl in part_files.values():
+                hdl.close()
+    for column in SPILL_COLUMNS:
+        os.remove(os.path.join(directory, f'{partition}.{column}'))
+    return names
+
+
+def _aggregate_partition(directory, partition, node_names) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Resolve the latencies of one spilled partition. Writes them, sorted, to a
+    file of their own for the global percentile, and returns the index of the
+    first RECV of every message along with its p50/p90/max latencies.
+    """
+    columns = {column: numpy.fromfile(os.path.join(directory, f'{partition}.{column}'), dtype=dtype)
+               for column, dtype in SPILL_COLUMNS.items()}
+    events = LogEvents(node_names, columns['time_ns'], columns['action'], columns['node'],
+                       columns['data_node'], columns['seq'], columns['interest_type'], [])
+    # Every message of a publisher is in the same partition as its PUBs and
+    # INTEREST,PUBLISH events, so this resolves them like the whole log would
+    recv_publish_times = _resolve_publish_times(events, events.times()).recv_publish_times
+    is_recv = events.action == ACTION_RECV
+    recv_table = RecvTable(node_names, events.data_node[is_recv], events.node[is_recv],
+                           events.seq[is_recv], recv_publish_times, events.times()[is_recv])
+    latencies = recv_table.latencies()
+    numpy.save(os.path.join(directory, f'{partition}.sorted.npy'), numpy.sort(latencies))
+
+    keys = recv_table.message_keys()
+    order = numpy.lexsort((latencies, keys))
+    _, starts, counts = numpy.unique(keys[order], return_index=True, return_counts=True)
+    sorted_latencies = latencies[order]
+    first_index = numpy.minimum.reduceat(columns['index'][is_recv][order], starts) \
+        if len(starts) else numpy.zeros(0, dtype=numpy.int64)
+    stats = numpy.stack((_segment_percentiles(sorted_latencies, starts, counts, 50),
+                         _segment_percentiles(sorted_latencies, starts, counts, 90),
+                         sorted_latencies[starts + counts - 1] if len(starts) else numpy.zeros(0)))
+    return first_index, stats
+
+
+def summarize_log_out_of_core(filepath, spill_dir=None, partitions=None,
+                              chunk_bytes=OUT_OF_CORE_CHUNK_BYTES,
+                              memory_budget=OUT_OF_CORE_MEMORY_BUDGET) -> LogSummary:
+    """
+    Compute the LogData metrics of a log that may not fit in memory.
+
+    The log is parsed `chunk_bytes` at a time and its events are spilled to
+    disk, partitioned by publisher. Then the partitions are aggregated one by
+    one: every message's latencies are in a single partition, so per-message
+    percentiles only need that partition in memory. The exact global 90th
+    percentile is selected from the sorted latency runs of every partition,
+    memory-mapped. What stays in memory is a chunk, a partition, and a few
+    numbers per message (not per RECV).
+
+    By default there are as many partitions as it takes for each to be
+    aggregated within `memory_budget` bytes, going by the size of the log;
+    partitions that still come out larger (a hub publishing most of the
+    messages, a compressed log) are split further before being aggregated.
+
+    Spill files go to a temporary directory in `spill_dir` (by default, the
+    system's temporary directory) and are removed afterwards.
+    """
+    directory = tempfile.mkdtemp(prefix='logspill-', dir=spill_dir)
+    try:
+        if partitions is None:
+            partitions = _out_of_core_partitions(filepath, memory_budget)
+        summary = _spill_log_events(filepath, directory, partitions, chunk_bytes)
+        partition_names = [name for partition in range(partitions)
+                           for name in _split_partition(directory, str(partition), memory_budget, chunk_bytes)]
+        first_index, stats = zip(*(_aggregate_partition(directory, partition, summary['node_names'])
+                                   for partition in partition_names))
+        # Average in the order the messages were first received, like
+        # LogData.latency_percentile_averages does
+        order = numpy.argsort(numpy.concatenate(first_index), kind='stable')
+        stats = numpy.concatenate(stats, axis=1)[:, order]
+        scale = math.sqrt(1)
+        percentile_averages = tuple(numpy.average(stats[i]) / scale for i in range(3))
+        runs = [numpy.load(os.path.join(directory, f'{partition}.sorted.npy'), mmap_mode='r')
+                for partition in partition_names]
+        percentile90 = _external_percentile(runs, 90)
+        del runs
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    trailer = summary['trailer']
+    interest_counts = summary['interest_counts']
+    return LogSummary(summary['nodes'], summary['end_time'], len(order),
+                      trailer.get('SYNC_PACK', 0), trailer.get('SYNC_BYTE', 0),
+                      trailer.get('MTU_SIZE', 0), int(interest_counts[INTEREST_PUBLISH]),
+                      int(interest_counts[INTEREST_SUPPRESSION]),
+                      int(interest_counts[INTEREST_PERIODIC]), percentile_averages, percentile90)
+
+
+class Metric:
+    """
+    A metric that evaluate_metrics computes while it goes through a log once.
+
+    Subclasses override the handlers of the events they care about and
+    result(); the engine only calls the handlers that are overridden. Every
+    event handler gets the timestamp (ms) and node of the line:
+
+    -   on_pub(timestamp, node, seq)
+    -   on_recv(timestamp, node, data_node, seq, latency), where `latency` is
+        measured against the publish time of data_node::seq, with the same
+        first sequence number correction as read_log_file
+    -   on_interest(timestamp, node, interest_type), where interest_type is
+        INTEREST_PUBLISH, INTEREST_SUPPRESSION or INTEREST_PERIODIC
+    -   on_trailer(key, value), for SYNC_PACK, SYNC_BYTE and MTU_SIZE
+
+    When the log is read in bulk (see evaluate_metrics), the whole table is
+    passed to on_events(table) instead, which by default calls the handlers
+    above for every event in order. Metrics that can be computed with array
+    operations override on_events too, so that they cost about nothing on
+    top of the parse.
+    """
+    # The key of the metric in the results of evaluate_metrics
+    name = None
+
+    def on_events(self, table: 'MetricEvents'):
+        handlers = {handler: getattr(self, handler) for handler in
+                    ('on_pub', 'on_recv', 'on_interest', 'on_trailer')
+                    if getattr(type(self), handler) is not getattr(Metric, handler)}
+        events = table.events
+        names = events.node_names
+        times = table.times.tolist()
+        actions = events.action.tolist()
+        nodes = events.node.tolist()
+        data_nodes = events.data_node.tolist()
+        seqs = events.seq.tolist()
+        interest_types = events.interest_type.tolist()
+        latencies = iter(table.recv_latencies().tolist() if 'on_recv' in handlers else [])
+        # Trailer lines come between the events, in the order of the log
+        trailer = sorted(events.trailer, key=lambda entry: entry[2]) if 'on_trailer' in handlers else []
+        next_trailer = 0
+        for i in range(len(times)):
+            while next_trailer < len(trailer) and trailer[next_trailer][2] <= i:
+                handlers['on_trailer'](*trailer[next_trailer][:2])
+                next_trailer += 1
+            action = actions[i]
+            if action == ACTION_PUB:
+                if 'on_pub' in handlers:
+                    handlers['on_pub'](times[i], names[nodes[i]], seqs[i])
+            elif action == ACTION_RECV:
+                if 'on_recv' in handlers:
+                    handlers['on_recv'](times[i], names[nodes[i]], names[data_nodes[i]], seqs[i],
+                                        next(latencies))
+            elif 'on_interest' in handlers:
+                handlers['on_interest'](times[i], names[nodes[i]], interest_types[i])
+        for key, value, _ in trailer[next_trailer:]:
+            handlers['on_trailer'](key, value)
+
+    def on_pub(self, timestamp, node, seq):
+        pass
+
+    def on_recv(self, timestamp, node, data_node, seq, latency):
+        pass
+
+    def on_interest(self, timestamp, node, interest_type):
+        pass
+
+    def on_trailer(self, key, value):
+        pass
+
+    def result(self):
+        raise NotImplementedError
+
+
+class MetricEvents:
+    """
+    A parsed log as evaluate_metrics passes it to Metric.on_events:
+
+    -   events: the LogEvents, cut off at the first event outside of the
+                timespan like the line-by-line scan does
+    -   times:  their timestamps in ms, the same floats as the text gives
+    -   recv_latencies(): the latency of every RECV, in log order, computed
+                on first use
+    """
+    def __init__(self, events: LogEvents, timespan=None):
+        times = events.times()
+        if timespan:
+            min_time, max_time = timespan
+            outside = numpy.flatnonzero(~((min_time <= times) & (times <= max_time)))
+            if len(outside):
+                cut = int(outside[0])
+                events = _slice_events(events, 0, cut)
+                # The scan never gets to the trailer after the cut
+                events.trailer = [entry for entry in events.trailer if entry[2] <= cut]
+                times = times[:cut]
+        self.events = events
+        self.times = times
+        self._latencies = None
+
+    def recv_latencies(self) -> numpy.ndarray:
+        if self._latencies is None:
+            recvs = self.events.action == ACTION_RECV
+            publish_times = _resolve_publish_times(self.events, self.times).recv_publish_times
+            self._latencies = self.times[recvs] - publish_times[:numpy.count_nonzero(recvs)]
+        return self._latencies
+
+
+# Metrics that evaluate_metrics can create by name
+METRICS = {}
+
+def register_metric(cls):
+    """
+    Class decorator that makes a Metric available by its name.
+    """
+    METRICS[cls.name] = cls
+    return cls
+
+
+@register_metric
+class InterestCountMetric(Metric):
+    """
+    The number of sync interests of each type.
+    """
+    name = 'interest_counts'
+
+    def __init__(self):
+        self.counts = [0, 0, 0]
+
+    def on_interest(self, timestamp, node, interest_type):
+        self.counts[interest_type] += 1
+
+    def on_events(self, table: MetricEvents):
+        events = table.events
+        counts = numpy.bincount(events.interest_type[events.action == ACTION_INTEREST], minlength=3)
+        for interest_type, count in enumerate(counts.tolist()):
+            self.counts[interest_type] += count
+
+    def result(self) -> dict:
+        return {INTEREST_TYPE_NAMES[interest_type].decode(): count
+                for interest_type, count in enumerate(self.counts)}
+
+
+@register_metric
+class TrailerMetric(Metric):
+    """
+    The raw SYNC_PACK / SYNC_BYTE / MTU_SIZE values of the trailer.
+    """
+    name = 'trailer'
+
+    def __init__(self):
+        self.trailer = {}
+
+    def on_trailer(self, key, value):
+        self.trailer[key] = value
+
+    def on_events(self, table: MetricEvents):
+        for key, value, _ in sorted(table.events.trailer, key=lambda entry: entry[2]):
+            self.trailer[key] = value
+
+    def result(self) -> dict:
+        return self.trailer
+
+
+@register_metric
+class EndTimeMetric(Metric):
+    """
+    The time of the last PUB or RECV, like LogData.end_time.
+    """
+    name = 'end_time'
+
+    def __init__(self):
+        self.end_time = 0
+
+    def on_pub(self, timestamp, node, seq):
+        self.end_time = max(timestamp, self.end_time)
+
+    def on_recv(self, timestamp, node, data_node, seq, latency):
+        self.end_time = max(timestamp, self.end_time)
+
+    def on_events(self, table: MetricEvents):
+        is_data = table.events.action != ACTION_INTEREST
+        if numpy.any(is_data):
+            self.end_time = max(float(table.times[is_data].max()), self.end_time)
+
+    def result(self) -> float:
+        return self.end_time
+
+
+@register_metric
+class AverageDelayMetric(Metric):
+    """
+    The average latency of the messages received by `node`, or by every node
+    if `node` is None.
+    """
+    name = 'average_delay'
+
+    def __init__(self, node=None):
+        self.node = node
+        self.total = 0
+        self.count = 0
+
+    def on_recv(self, timestamp, node, data_node, seq, latency):
+        if self.node is None or node == self.node:
+            self.total += latency
+            self.count += 1
+
+    def on_events(self, table: MetricEvents):
+        latencies = table.recv_latencies()
+        if self.node is not None:
+            events = table.events
+            if self.node not in events.node_names:
+                return
+            receivers = events.node[events.action == ACTION_RECV]
+            latencies = latencies[receivers == events.node_names.index(self.node)]
+        # Summed one by one, like on_recv does, so the result is the same
+        self.total += sum(latencies.tolist())
+        self.count += len(latencies)
+
+    def result(self) -> float:
+        return self.total / self.count if self.count else float('nan')
+
+
+@register_metric
+class LatencySketchMetric(Metric):
+    """
+    A LatencySketch of every latency in the log.
+    """
+    name = 'latency_sketch'
+
+    def __init__(self, relative_accuracy=0.01):
+        self.sketch = LatencySketch(relative_accuracy)
+
+    def on_recv(self, timestamp, node, data_node, seq, latency):
+        self.sketch.add(latency)
+
+    def on_events(self, table: MetricEvents):
+        self.sketch.add_many(table.recv_latencies())
+
+    def result(self) -> LatencySketch:
+        return self.sketch
+
+
+@register_metric
+class LogDataMetric(Metric):
+    """
+    Builds the LogData of the log, which is what read_log_file returns. With
+    a `latency_sketch`, the latencies go into the sketch instead of being
+    kept; with a `sample`, only the RECVs of that fraction of the messages
+    count (see read_log_file for both).
+    """
+    name = 'log_data'
+
+    def __init__(self, latency_sketch: LatencySketch = None, sample=None):
+        self.latency_sketch = latency_sketch
+        self.sample = sample
+        self.nodes = set()
+        self.messages = set()
+        # Keep track of publish times for messages, e.g. /A1::1. So we need a
+        # nested dictionary.
+        self.publish_times = defaultdict(dict)
+        # Keep track of the receive times per node. For example, keep track of
+        # when node A1 recieved A2::1, A23::4, etc. So index by sender and then
+        # by message, leading to a doubly-nested dictionary.
+        self.receive_times = defaultdict(lambda: defaultdict(dict))
+        # Keep track of the latencies for a given message
+        self.latencies = defaultdict(list)
+        # Keep track of some other statistics
+        self.end_time = 0
+        self.sync_pack = 0
+        self.sync_byte = 0
+        self.mtu_size = 0
+        self.interest_counts = [0, 0, 0]
+        # The messages received, which `latencies` doesn't keep with a sketch
+        self.received = set()
+        # The messages a preview keeps, hashed once when they are published
+        self.sampled = set()
+        # Where the interest table of the LogData can be read from, see
+        # LogData.interest_source; set by whoever feeds the lines
+        self.interest_source = None
+        # Set instead of the above when the whole log is handed to on_events
+        self.log_data = None
+
+    def on_pub(self, timestamp, node, seq):
+        self.end_time = max(timestamp, self.end_time)
+        self.nodes.add(node)
+        self.messages.add((node, seq))
+        self.publish_times[node][seq] = timestamp
+        if self.sample is not None and message_sampled(node, seq, self.sample):
+            self.sampled.add((node, seq))
+
+    def on_recv(self, timestamp, node, data_node, seq, latency):
+        self.end_time = max(timestamp, self.end_time)
+        self.nodes.add(node)
+        self.messages.add((node, seq))
+        if self.sample is not None and (data_node, seq) not in self.sampled:
+            return
+        # The publisher gets an entry here, even if it never published
+        self.publish_times[data_node]
+        if self.latency_sketch is not None:
+            self.latency_sketch.add(latency)
+            self.received.add((data_node, seq))
+        else:
+            self.receive_times[node][data_node][seq] = timestamp
+            self.latencies[(data_node, seq)].append(latency)
+
+    def on_interest(self, timestamp, node, interest_type):
+        self.interest_counts[interest_type] += 1
+        if interest_type == INTEREST_PUBLISH:
+            # See read_log_file for why the first sequence number is special
+            if len(self.publish_times[node]) == 1:
+                # This INTEREST,PUBLISH message is the actual time that the
+                # first node sent out its initial sequence number.
+                self.publish_times[node][1] = timestamp
+
+    def on_trailer(self, key, value):
+        if key == 'SYNC_PACK':
+            self.sync_pack = value
+        elif key == 'SYNC_BYTE':
+            self.sync_byte = value
+        elif key == 'MTU_SIZE':
+            self.mtu_size = min(value, len(self.nodes))
+
+    def on_events(self, table: MetricEvents):
+        self.log_data = _log_data_from_events(table.events, sample=self.sample)
+        if self.latency_sketch is not None:
+            self.latency_sketch.add_many(self.log_data.recv_table.latencies())
+            self.log_data.latency_sketch = self.latency_sketch
+
+    def complete(self) -> bool:
+        if self.log_data is not None:
+            return self.log_data.mtu_size != 0
+        return self.mtu_size != 0
+
+    def result(self, snapshot=False) -> LogData:
+        """
+        The LogData of the lines seen so far. It shares the dicts this metric
+        keeps filling in, unless `snapshot` is set: then they are copied, so
+        that more lines don't change it (or make its cached metrics stale).
+        """
+        if self.log_data is not None:
+            return self.log_data
+        nodes, messages = self.nodes, self.messages
+        publish_times, receive_times, latencies = self.publish_times, self.receive_times, self.latencies
+        if snapshot:
+            nodes, messages = set(nodes), set(messages)
+            publish_times = defaultdict(dict, {node: dict(seqs) for node, seqs in publish_times.items()})
+            receive_times = defaultdict(lambda: defaultdict(dict))
+            for node, by_publisher in self.receive_times.items():
+                receive_times[node].update({publisher: dict(seqs) for publisher, seqs in by_publisher.items()})
+            latencies = defaultdict(list, {message: list(values) for message, values in latencies.items()})
+        log_data = LogData(nodes, messages, publish_times, receive_times,
+                           latencies, self.end_time, self.sync_pack, self.sync_byte,
+                           self.mtu_size, self.interest_counts[INTEREST_PUBLISH],
+                           self.interest_counts[INTEREST_SUPPRESSION],
+                           self.interest_counts[INTEREST_PERIODIC])
+        log_data.interest_source = self.interest_source
+        log_data.latency_sketch = self.latency_sketch
+        if self.latency_sketch is not None:
+            log_data.num_received_messages = len(self.received)
+        if self.sample is not None:
+            log_data.sample_fraction = self.sample
+        return log_data
+
+
+def _overridden_handlers(metrics: List[Metric], handler) -> list:
+    return [getattr(metric, handler) for metric in metrics
+            if getattr(type(metric), handler) is not getattr(Metric, handler)]
+
+
+def _create_metrics(metrics) -> List[Metric]:
+    metrics = [METRICS[metric]() if isinstance(metric, str) else metric for metric in metrics]
+    names = [metric.name for metric in metrics]
+    if len(set(names)) != len(names):
+        raise Exception(f'Metric names must be unique, got {names}')
+    return metrics
+
+
+class _MetricScanner:
+    """
+    Feeds the lines of a log to a set of metrics one at a time, keeping the
+    state needed between lines (the publish times of the messages).
+    """
+    def __init__(self, metrics, timespan=None):
+        self.metrics = _create_metrics(metrics)
+        self.pub_handlers = _overridden_handlers(self.metrics, 'on_pub')
+        self.recv_handlers = _overridden_handlers(self.metrics, 'on_recv')
+        self.interest_handlers = _overridden_handlers(self.metrics, 'on_interest')
+        self.trailer_handlers = _overridden_handlers(self.metrics, 'on_trailer')
+        self.interest_types = INTEREST_TYPES
+        if timespan:
+            self.min_time, self.max_time = timespan
+        else:
+            self.min_time, self.max_time = 0, float('inf')
+        # The latency of a RECV needs the publish time of its message, whether
+        # or not any metric looks at PUBs
+        self.publish_times = defaultdict(dict)
+        # A LogDataMetric keeps exactly the same map (unless it samples, when
+        # it only touches the publishers of the sampled RECVs), so share it
+        for metric in self.metrics:
+            if isinstance(metric, LogDataMetric) and metric.sample is None:
+                self.publish_times = metric.publish_times
+
+    def feed(self, line: str) -> bool:
+        """
+        Process one line of the log. Returns False, without processing it, if
+        the line is outside of the timespan; nothing after it should be fed.
+        """
+        # Event lines start with their timestamp, so only the others need a
+        # closer look
+        if not line[:1].isdigit():
+            if line.startswith(('SYNC', 'MTU_SIZE')):
+                key, value = line.split('=')
+                for handler in self.trailer_handlers:
+                    handler(key, int(value))
+                return True
+            # Debug output of core.cpp, see DiagnosticEvents
+            if line.startswith(('(', '/')):
+                return True
+
+        line = line.split(',')
+        timestamp = float(line[0])
+        node = line[1][1:]
+        action = line[2]
+
+        if not (self.min_time <= timestamp <= self.max_time):
+            return False
+
+        if action == 'INTEREST':
+            interest_type = self.interest_types.get(line[3].strip())
+            if interest_type is None:
+                raise Exception(f'Unknown interest type "{line[3].strip()}"')
+            # See read_log_file for why the first sequence number is special
+            if interest_type == INTEREST_PUBLISH and len(self.publish_times[node]) == 1:
+                self.publish_times[node][1] = timestamp
+            for handler in self.interest_handlers:
+                handler(timestamp, node, interest_type)
+            return True
+
+        data_node, seq_number = line[3].split('::')
+        data_node = data_node[1:]
+        seq_number = int(seq_number)
+        if action == 'PUB':
+            self.publish_times[node][seq_number] = timestamp
+            for handler in self.pub_handlers:
+                handler(timestamp, node, seq_number)
+        elif action == 'RECV':
+            latency = timestamp - self.publish_times[data_node][seq_number]
+            for handler in self.recv_handlers:
+                handler(timestamp, node, data_node, seq_number, latency)
+        else:
+            raise Exception('Unrecognized message!')
+        return True
+
+    def results(self) -> dict:
+        return {metric.name: metric.result() for metric in self.metrics}
+
+
+def evaluate_metrics(filepath, metrics, timespan=None, engine='numpy', sidecar=True) -> dict:
+    """
+    Compute several metrics in a single pass over a log. `metrics` is a list
+    of Metric instances, or names of registered metrics (which are then
+    created with their default arguments). Returns {metric name: result}.
+
+    With the 'numpy' engine the log is parsed in bulk (or loaded from its
+    event sidecar, see read_log_events) and handed to every metric's
+    on_events. With 'python' it is scanned line by line, feeding every line
+    to the handlers. Either way the lines are interpreted the same way,
+    including the timespan: the scan stops at the first event outside of it.
+    """
+    if engine == 'numpy':
+        metrics = _create_metrics(metrics)
+        table = MetricEvents(read_log_events(find_log_file(filepath) or filepath, sidecar), timespan)
+        for metric in metrics:
+            metric.on_events(table)
+        return {metric.name: metric.result() for metric in metrics}
+    elif engine != 'python':
+        raise Exception(f'Unknown metric engine "{engine}"')
+    scanner = _MetricScanner(metrics, timespan)
+    with open_log_file(filepath) as hdl:
+        for line in hdl:
+            if not scanner.feed(line):
+                break
+    for metric in scanner.metrics:
+        if isinstance(metric, LogDataMetric):
+            metric.interest_source = (find_log_file(filepath) or filepath, timespan, None, sidecar)
+    return scanner.results()
+
+
+class LogFollower:
+    """
+    Follows a log while the simulator is still writing it. Every poll() only
+    reads the bytes appended since the previous one, and updates a LogData
+    (the same one read_log_file would give for what was written so far), a
+    running LatencySketch and any other `metrics`.
+
+    Typical use, e.g. from a script watching conduct_full_simulation:
+
+        follower = LogFollower(output_file)
+        for log_data in follower.follow(interval=5):
+            print(log_data.end_time, follower.latency_percentiles())
+    """
+    def __init__(self, filepath, metrics=(), relative_accuracy=0.01):
+        if log_compression(filepath):
+            raise Exception(f'Cannot follow the compressed log {filepath}')
+        self.filepath = filepath
+        self.offset = 0
+        self._partial = b''
+        self._log_data = LogDataMetric()
+        self._sketch = LatencySketchMetric(relative_accuracy)
+        self._scanner = _MetricScanner([self._log_data, self._sketch] + list(metrics))
+
+    def poll(self) -> int:
+        """
+        Process the complete lines appended to the log since the last poll.
+        Returns how many there were.
+        """
+        if not os.path.isfile(self.filepath):
+            return 0
+        if os.path.getsize(self.filepath) < self.offset:
+            raise Exception(f'{self.filepath} was truncated (is the simulation running again?), '
+                            'start a new LogFollower')
+        with open(self.filepath, 'rb') as hdl:
+            hdl.seek(self.offset)
+            data = hdl.read()
+        self.offset += len(data)
+        lines = (self._partial + data).split(b'\n')
+        # The last line is still being written, unless it is empty
+        self._partial = lines.pop()
+        processed = 0
+        for line in lines:
+            if line:
+                self._scanner.feed(line.decode())
+                processed += 1
+        return processed
+
+    def log_data(self) -> LogData:
+        """
+        The LogData of everything read so far. It is a copy, which later
+        polls leave alone, so this costs as much as the log read so far; the
+        polls themselves only cost as much as what was appended.
+        """
+        # The interest table comes from the bytes processed so far
+        self._log_data.interest_source = (self.filepath, None, self.offset - len(self._partial), False)
+        return self._log_data.result(snapshot=True)
+
+    def latency_percentiles(self) -> Tuple[float, float, float]:
+        """
+        The running 50th, 90th and 99th percentile latencies, or None before
+        the first RECV.
+        """
+        sketch = self._sketch.result()
+        return sketch.percentiles() if sketch.count else None
+
+    def results(self) -> dict:
+        """
+        The results of every metric so far, by name.
+        """
+        return self._scanner.results()
+
+    def complete(self) -> bool:
+        return self._log_data.complete()
+
+    def follow(self, interval=1.0, idle_timeout=600.0):
+        """
+        Poll the log every `interval` seconds and yield the LogData whenever
+        something was appended, until the simulation wrote its trailer.
+
+        The simulator prints something every few simulated milliseconds, so
+        when nothing was appended for `idle_timeout` seconds it most likely
+        died without writing its trailer, and an exception is raised instead
+        of waiting forever. Pass None to wait forever anyway.
+        """
+        last_update = time.monotonic()
+        while True:
+            if self.poll():
+                last_update = time.monotonic()
+                yield self.log_data()
+            if self.complete():
+                return
+            if idle_timeout is not None and time.monotonic() - last_update > idle_timeout:
+                raise Exception(f'Nothing was appended to {self.filepath} for {idle_timeout} s '
+                                'and it has no trailer, did the simulation die?')
+            time.sleep(interval)
 
 
 def avg_pub_recv_delay_between_nodes(node1, node2, publish_times, receive_times):
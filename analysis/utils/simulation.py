@@ -2,9 +2,12 @@ from asyncio.subprocess import DEVNULL
 import subprocess
 import sys
 import os
+import shutil
 import time
 from multiprocessing import Process
 
+from .analysis import (LOG_COMPRESSION_SUFFIXES, find_log_file, open_log_file,
+                       read_log_trailer, trailer_complete)
 from .colors import Colors
 
 ROOT_PATH = '/home/developer/scenario-svs-217b'
@@ -12,8 +15,42 @@ PROCESSED_TOPOLOGIES_PATH = ROOT_PATH + '/topologies/processed/'
 SIMULATOR_PATH = ROOT_PATH + '/build/simulate'
 LOGGING_PATH = ROOT_PATH + '/analysis/logs/'
 
+def _existing_log(output_file) -> str:
+    """
+    The finished simulation log for `output_file`, compressed or not, or None
+    if it still has to be simulated. A log without its trailer was cut off
+    (the simulator crashed or got interrupted) or is still being written, so
+    we don't skip it; it is left alone here and simply overwritten if we do
+    simulate it again.
+    """
+    existing = find_log_file(output_file)
+    if existing is None:
+        return None
+    if trailer_complete(read_log_trailer(existing)):
+        return existing
+    print(Colors.WARNING + f'{existing} is incomplete, simulating it again' + Colors.ENDC)
+    return None
+
+def _run_simulator(args, output_file, compression=None) -> str:
+    """
+    Run the simulator, writing its output to `output_file`, or to
+    `output_file` plus a .gz/.zst suffix if `compression` is 'gzip' or 'zstd'.
+    The output is compressed as it streams out of the simulator. Returns the
+    path of the log.
+    """
+    if compression is None:
+        with open(output_file, 'w') as hdl:
+            subprocess.run(args, stdout=hdl, stderr=DEVNULL)
+        return output_file
+    output_file += LOG_COMPRESSION_SUFFIXES[compression]
+    with open_log_file(output_file, 'wb') as hdl:
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=DEVNULL)
+        shutil.copyfileobj(process.stdout, hdl, 1024 * 1024)
+        process.wait()
+    return output_file
+
 def randrecent(topology_name, n_random, n_recent, publish_rate_ms,
-               stop_second, drop_rate, subfolder) -> str:
+               stop_second, drop_rate, subfolder, compression=None) -> str:
     """
     Run a Random-Recent, Random or Recent simulation. Returns the output file.
     """
@@ -21,24 +58,25 @@ def randrecent(topology_name, n_random, n_recent, publish_rate_ms,
         f'randrec-{topology_name}-{n_random}-{n_recent}-{publish_rate_ms}-{stop_second}-{drop_rate}'
     print(Colors.HEADER + f'Running {output_file}...' + Colors.ENDC, end='')
     sys.stdout.flush()
-    if os.path.isfile(output_file):
+    existing = _existing_log(output_file)
+    if existing:
         print('already exists!')
+        output_file = existing
     else:
         start_time = time.time()
-        with open(output_file, 'w') as hdl:
-            # args = [
-            #     SIMULATOR_PATH, PROCESSED_TOPOLOGIES_PATH + topology_name,
-            #     str(n_random), str(n_recent), str(publish_rate_ms),
-            #     str(stop_second), str(drop_rate), '0'
-            # ]
-            # print(' '.join(args))
-            subprocess.run(args, stdout=hdl, stderr=DEVNULL)
+        args = [
+            SIMULATOR_PATH, PROCESSED_TOPOLOGIES_PATH + topology_name,
+            str(n_random), str(n_recent), str(publish_rate_ms),
+            str(stop_second), str(drop_rate), '0'
+        ]
+        # print(' '.join(args))
+        output_file = _run_simulator(args, output_file, compression)
         end_time = time.time()
         print(f'done in {(end_time - start_time):.2f} sec')
     return output_file
 
 def rand(topology_name, n_random, n_recent, publish_rate_ms,
-               stop_second, drop_rate, subfolder) -> str:
+               stop_second, drop_rate, subfolder, compression=None) -> str:
     """
     Run a Random-Recent, Random or Recent simulation. Returns the output file.
     """
@@ -47,41 +85,46 @@ def rand(topology_name, n_random, n_recent, publish_rate_ms,
         f'rand-{topology_name}-{n_random}-{n_recent}-{publish_rate_ms}-{stop_second}-{drop_rate}'
     print(Colors.HEADER + f'Running {output_file}...' + Colors.ENDC, end='')
     sys.stdout.flush()
-    if os.path.isfile(output_file):
+    existing = _existing_log(output_file)
+    if existing:
         print('already exists!')
+        output_file = existing
     else:
         start_time = time.time()
-        with open(output_file, 'w') as hdl:
-            subprocess.run([SIMULATOR_PATH, PROCESSED_TOPOLOGIES_PATH + topology_name,
-                            str(n_random), str(n_recent), str(publish_rate_ms),
-                            str(stop_second), str(drop_rate), '0'], stdout=hdl, stderr=DEVNULL)
+        output_file = _run_simulator([SIMULATOR_PATH, PROCESSED_TOPOLOGIES_PATH + topology_name,
+                                      str(n_random), str(n_recent), str(publish_rate_ms),
+                                      str(stop_second), str(drop_rate), '0'],
+                                     output_file, compression)
         end_time = time.time()
         print(f'done in {(end_time - start_time):.2f} sec')
     return output_file
 
-def base(topology_name, publish_rate_ms, stop_second, drop_rate, subfolder) -> str:
+def base(topology_name, publish_rate_ms, stop_second, drop_rate, subfolder,
+         compression=None) -> str:
     """
     Run a base simulation (send the entire state vector in a single interest)
     """
     output_file = LOGGING_PATH + subfolder + '/' + \
         f'base-{topology_name}-{publish_rate_ms}-{stop_second}-{drop_rate}'
     sys.stdout.flush()
-    if os.path.isfile(output_file):
+    existing = _existing_log(output_file)
+    if existing:
+        output_file = existing
         print(Colors.HEADER + f'{output_file}' + Colors.ENDC + ' already exists!')
     else:
         start_time = time.time()
         print(Colors.OKGREEN + f'Running {output_file}' + Colors.ENDC)
-        with open(output_file, 'w') as hdl:
-            args = [SIMULATOR_PATH, PROCESSED_TOPOLOGIES_PATH + topology_name,
-                '99999', '0', str(publish_rate_ms), str(stop_second), str(drop_rate), '0']
-            # print(' '.join(args))
-            subprocess.run(args, stdout=hdl, stderr=DEVNULL)
+        args = [SIMULATOR_PATH, PROCESSED_TOPOLOGIES_PATH + topology_name,
+            '99999', '0', str(publish_rate_ms), str(stop_second), str(drop_rate), '0']
+        # print(' '.join(args))
+        output_file = _run_simulator(args, output_file, compression)
         end_time = time.time()
         print(f'{output_file} DONE in {(end_time - start_time):.2f} sec')
     return output_file
 
 
-def fragment(topology_name, publish_rate_ms, stop_second, drop_rate, mtu_size, subfolder) -> str:
+def fragment(topology_name, publish_rate_ms, stop_second, drop_rate, mtu_size, subfolder,
+             compression=None) -> str:
     """
     Run a full fragment simulation (send out the entire state vector in multiple
     sync interests, with `mtu_size` states per interest).
@@ -90,14 +133,15 @@ def fragment(topology_name, publish_rate_ms, stop_second, drop_rate, mtu_size, s
         f'fullfrag-{topology_name}-{publish_rate_ms}-{stop_second}-{drop_rate}-{mtu_size}'
     print(Colors.HEADER + f'Running {output_file}...' + Colors.ENDC, end='')
     sys.stdout.flush()
-    if os.path.isfile(output_file):
+    existing = _existing_log(output_file)
+    if existing:
         print('already exists!')
+        output_file = existing
     else:
         start_time = time.time()
-        with open(output_file, 'w') as hdl:
-            subprocess.run([SIMULATOR_PATH, PROCESSED_TOPOLOGIES_PATH + topology_name,
-                            '99999', '0', str(publish_rate_ms), str(stop_second), str(drop_rate), str(mtu_size)],
-                        stdout=hdl, stderr=DEVNULL)
+        output_file = _run_simulator([SIMULATOR_PATH, PROCESSED_TOPOLOGIES_PATH + topology_name,
+                                      '99999', '0', str(publish_rate_ms), str(stop_second), str(drop_rate), str(mtu_size)],
+                                     output_file, compression)
         end_time = time.time()
         print(f'done in {(end_time - start_time):.2f} sec')
     return output_file
@@ -109,10 +153,12 @@ def conduct_full_simulation(topologies,
                             drop_rates,
                             randrec_tuples,
                             mtu_sizes,
-                            subfolder=''):
+                            subfolder='',
+                            compression=None):
     """
     Runs base, full frag, and randrec simulations for each topology, pub rate,
-    stop second, and drop rate.
+    stop second, and drop rate. With `compression` ('gzip' or 'zstd') the logs
+    are stored compressed.
     """
     if not os.path.exists(LOGGING_PATH + subfolder):
         os.mkdir(LOGGING_PATH + subfolder)
@@ -121,7 +167,7 @@ def conduct_full_simulation(topologies,
             for stop_second in stop_seconds:
                 for drop_rate in drop_rates:
                     # Simulate base first
-                    process = Process(target=base, args=(topology, publish_rate, stop_second, drop_rate, subfolder))
+                    process = Process(target=base, args=(topology, publish_rate, stop_second, drop_rate, subfolder, compression))
                     process.start()
                     # base(topology, publish_rate, stop_second, drop_rate, subfolder)
                     # # Simulate fullfrag next
@@ -0,0 +1,388 @@
+import gzip
+import os
+import shutil
+import sys
+
+import numpy
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from analysis import (LatencySketch, LogFollower, RecvTable, complete_logs, find_log_file, glob_logs,
+                      incomplete_logs, load_time_index, open_log_file, read_legacy_logs, read_log_diagnostics, read_log_file,
+                      read_log_trailer, read_log_window, read_log_windows, trailer_complete)
+
+# A small log that is checked in, with a bit of everything (PUBs, RECVs, all
+# three interest types and the trailer)
+LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs',
+                        'geant_large_week_8_250', 'base-geant_large_44-44000-500-0.5')
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+
+SUMMARY_METRICS = ['latency_percentile_averages', '_90th_percentile_latency',
+                   'total_pubs_per_second', 'complete']
+SUMMARY_FIELDS = ['nodes', 'end_time', 'sync_pack', 'sync_bytes', 'mtu_size', 'num_publish_interests',
+                  'num_suppression_interests', 'num_periodic_interests']
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    # A copy, so that the sidecars the engines write don't end up in the repo
+    filepath = tmp_path / os.path.basename(LOG_FILE)
+    shutil.copyfile(LOG_FILE, filepath)
+    return str(filepath)
+
+
+@pytest.fixture
+def expected(log_file):
+    return read_log_file(log_file, engine='python')
+
+
+def assert_same_log_data(expected, actual):
+    for field in SUMMARY_FIELDS + ['messages']:
+        assert getattr(actual, field) == getattr(expected, field), field
+    assert dict(actual.publish_times) == dict(expected.publish_times)
+    assert {node: dict(by_publisher) for node, by_publisher in actual.receive_times.items()} == \
+        {node: dict(by_publisher) for node, by_publisher in expected.receive_times.items()}
+    # The order of the messages matters for the percentile averages
+    assert list(actual.latencies.keys()) == list(expected.latencies.keys())
+    assert dict(actual.latencies) == dict(expected.latencies)
+    for metric in SUMMARY_METRICS:
+        assert getattr(actual, metric)() == getattr(expected, metric)(), metric
+
+
+@pytest.mark.parametrize('engine, workers', [('numpy', 1), ('lazy', 1), ('numpy', 2)])
+def test_engine_matches_python(log_file, expected, engine, workers):
+    assert_same_log_data(expected, read_log_file(log_file, engine=engine, workers=workers))
+    # The second read comes from the sidecar
+    assert_same_log_data(expected, read_log_file(log_file, engine=engine, workers=workers))
+
+
+@pytest.mark.parametrize('engine', ['numpy', 'lazy'])
+def test_timespan_matches_python(log_file, engine):
+    timespan = (0, 200000.0)
+    assert_same_log_data(read_log_file(log_file, timespan, engine='python'),
+                         read_log_file(log_file, timespan, engine=engine))
+
+
+def test_outofcore_matches_python(log_file, expected):
+    summary = read_log_file(log_file, engine='outofcore')
+    for field in SUMMARY_FIELDS:
+        assert getattr(summary, field) == getattr(expected, field), field
+    for metric in SUMMARY_METRICS:
+        assert getattr(summary, metric)() == getattr(expected, metric)(), metric
+
+
+@pytest.mark.parametrize('bucket_ms, per_node', [(1000, False), (5000, True)])
+def test_interest_time_series_matches_numpy(log_file, expected, bucket_ms, per_node):
+    # The python engine only reads the interest table when it is used
+    assert expected.interest_table is None
+    series = expected.interest_time_series(bucket_ms, per_node)
+    numpy_series = read_log_file(log_file, engine='numpy').interest_time_series(bucket_ms, per_node)
+    assert series.keys() == numpy_series.keys()
+    for key in series:
+        assert numpy.array_equal(series[key], numpy_series[key]), key
+    total = sum(int(numpy.sum(series[name])) for name in ('PUBLISH', 'SUPPRESSION', 'PERIODIC'))
+    assert total == expected.num_publish_interests + expected.num_suppression_interests + \
+        expected.num_periodic_interests
+
+
+def test_preview_matches_numpy(log_file, expected):
+    preview = read_log_file(log_file, engine='python', sample=0.3)
+    assert_same_log_data(read_log_file(log_file, engine='numpy', sample=0.3), preview)
+    assert preview.sample_fraction == 0.3
+    # Only whole messages are sampled, with every one of their RECVs
+    assert 0 < len(preview.latencies) < len(expected.latencies)
+    for message, latencies in preview.latencies.items():
+        assert latencies == expected.latencies[message]
+
+
+@pytest.mark.parametrize('suffix', ['.gz', '.zst'])
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_compressed_log_matches_raw(tmp_path, expected, suffix, engine):
+    filepath = str(tmp_path / 'base-log')
+    with open(LOG_FILE, 'rb') as hdl, open_log_file(filepath + suffix, 'wb') as compressed:
+        compressed.write(hdl.read())
+    # Found without the suffix, like the uncompressed log would be
+    assert find_log_file(filepath) == filepath + suffix
+    assert_same_log_data(expected, read_log_file(filepath + suffix, engine=engine))
+    assert trailer_complete(read_log_trailer(filepath + suffix))
+
+
+def test_truncated_compressed_log_is_incomplete(tmp_path):
+    with open(LOG_FILE, 'rb') as hdl:
+        data = hdl.read()
+    complete = tmp_path / 'base-complete'
+    with gzip.open(str(complete) + '.gz', 'wb') as hdl:
+        hdl.write(data)
+    compressed = gzip.compress(data)
+    with open(tmp_path / 'base-truncated.gz', 'wb') as hdl:
+        hdl.write(compressed[:len(compressed) * 3 // 4])
+    trailer = read_log_trailer(str(tmp_path / 'base-truncated.gz'))
+    assert trailer['truncated'] and trailer['has_data']
+    assert not trailer_complete(trailer)
+    assert complete_logs(str(tmp_path)) == [str(complete) + '.gz']
+    assert incomplete_logs(str(tmp_path)) == [str(tmp_path / 'base-truncated.gz')]
+
+
+def test_prefers_the_complete_copy_of_a_log(tmp_path):
+    with open(LOG_FILE, 'rb') as hdl:
+        data = hdl.read()
+    filepath = str(tmp_path / 'base-log')
+    # A re-run that crashed next to the compressed log of the first run
+    with open(filepath, 'wb') as hdl:
+        hdl.write(data[:len(data) // 2])
+    with gzip.open(filepath + '.gz', 'wb') as hdl:
+        hdl.write(data)
+    assert find_log_file(filepath) == filepath + '.gz'
+    assert glob_logs(str(tmp_path / '*-*')) == [filepath + '.gz']
+    assert complete_logs(str(tmp_path)) == [filepath + '.gz']
+    assert incomplete_logs(str(tmp_path)) == []
+
+
+def test_lazy_latency_lookup(log_file, expected, monkeypatch):
+    lazy = read_log_file(log_file, engine='lazy')
+    # Looking up one message only subtracts the times of its own RECVs
+    monkeypatch.setattr(RecvTable, 'latencies', lambda table: pytest.fail('computed every latency'))
+    message = next(iter(expected.latencies))
+    assert lazy.latencies[message] == expected.latencies[message]
+    assert lazy.latencies[('/not-a-node', 0)] == []
+
+
+def test_follower_snapshots_dont_go_stale(tmp_path, expected):
+    with open(LOG_FILE, 'rb') as hdl:
+        data = hdl.read()
+    filepath = str(tmp_path / 'base-log')
+    with open(filepath, 'wb') as hdl:
+        # Cut in the middle of a line, like a simulator still writing it
+        hdl.write(data[:len(data) // 2 + 7])
+    follower = LogFollower(filepath)
+    assert follower.poll() > 0
+    first = follower.log_data()
+    first_averages = first.latency_percentile_averages()
+    first_messages = len(first.latencies)
+    assert not follower.complete()
+
+    with open(filepath, 'ab') as hdl:
+        hdl.write(data[len(data) // 2 + 7:])
+    assert follower.poll() > 0
+    assert follower.complete()
+    # Neither the data nor the cached metrics of the first snapshot moved
+    assert len(first.latencies) == first_messages
+    assert first.latency_percentile_averages() == first_averages
+    assert first_messages < len(expected.latencies)
+    assert_same_log_data(expected, follower.log_data())
+
+
+def test_follow_gives_up_on_a_dead_simulation(tmp_path):
+    with open(LOG_FILE, 'rb') as hdl:
+        data = hdl.read()
+    filepath = str(tmp_path / 'base-log')
+    with open(filepath, 'wb') as hdl:
+        hdl.write(data[:len(data) // 2])
+    updates = []
+    with pytest.raises(Exception, match='did the simulation die'):
+        for log_data in LogFollower(filepath).follow(interval=0.01, idle_timeout=0.05):
+            updates.append(log_data)
+    assert len(updates) == 1
+
+
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_dissemination_counts_unreceived_messages(tmp_path, engine):
+    filepath = tmp_path / 'base-log'
+    filepath.write_text('0.000000,/a,PUB,/a::1\n'
+                        '10.000000,/b,RECV,/a::1\n'
+                        '30.000000,/c,RECV,/a::1\n'
+                        # A duplicate RECV, which doesn't count again
+                        '30.000000,/c,RECV,/a::1\n'
+                        # Nobody receives this one
+                        '100.000000,/a,PUB,/a::2\n'
+                        'SYNC_PACK=1\nSYNC_BYTE=1\nMTU_SIZE=3\n')
+    log_data = read_log_file(str(filepath), engine=engine)
+    half, everyone = log_data.dissemination_times((0.5, 1.0))
+    assert half[0] == 10 and everyone[0] == 30
+    assert numpy.isnan(half[1]) and numpy.isnan(everyone[1])
+    times, delivered = log_data.dissemination_curve()
+    # Two of the four (message, other node) pairs were delivered
+    assert list(times) == [10, 30]
+    assert list(delivered) == [0.25, 0.5]
+
+
+def test_windows_match_single_reads(log_file):
+    windows = [(100000.0, 300000.0), 250000.0, (450000.0, 600000.0), (700000.0, 800000.0)]
+    log_datas = read_log_windows(log_file, windows, sidecar=False)
+    # The last window is past the end of the log, which is all in the trailer
+    past_end = log_datas.pop()
+    assert not past_end.latencies and past_end.end_time == 0
+    assert past_end.sync_pack == read_log_window(log_file, windows.pop()).sync_pack != 0
+    for window, log_data in zip(windows, log_datas):
+        if isinstance(window, tuple):
+            expected = read_log_window(log_file, window)
+            assert dict(log_data.publish_times) == dict(expected.publish_times)
+        else:
+            expected = read_log_file(log_file, (0, window), engine='python')
+        assert_same_log_data(expected, log_data)
+
+
+@pytest.mark.parametrize('max_time', [1234.5, 250000.0, 1e9])
+def test_time_index_window_matches_cutoff(log_file, max_time):
+    # The timestamps of the log never go backwards, so the window from 0 is
+    # what stopping at the first later event gives
+    assert_same_log_data(read_log_file(log_file, (0, max_time), engine='python'),
+                         read_log_window(log_file, (0, max_time)))
+
+
+def test_time_index_is_rebuilt_for_a_changed_log(log_file):
+    index = load_time_index(log_file)
+    # Loaded from its sidecar the second time
+    assert numpy.array_equal(load_time_index(log_file)['offsets'], index['offsets'])
+    with open(log_file, 'a') as hdl:
+        hdl.write('600000.000000,/it,PUB,/it::9999\n')
+    assert load_time_index(log_file)['offsets'][-1] > index['offsets'][-1]
+    window = read_log_window(log_file, (550000.0, 650000.0))
+    assert window.messages == {('it', 9999)}
+
+
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_node_delay_report(log_file, expected, engine):
+    report = read_log_file(log_file, engine=engine).node_delay_report((50, 99))
+    by_receiver = {}
+    for receiver, by_publisher in expected.receive_times.items():
+        for publisher, seqs in by_publisher.items():
+            by_receiver.setdefault(receiver, []).extend(
+                timestamp - expected.publish_times[publisher][seq] for seq, timestamp in seqs.items())
+    assert report.keys() == by_receiver.keys()
+    for receiver, latencies in by_receiver.items():
+        row = report[receiver]
+        assert row['count'] == len(latencies)
+        assert row['average'] == pytest.approx(numpy.mean(latencies))
+        assert (row['p50'], row['p99']) == tuple(numpy.percentile(latencies, [50, 99]))
+
+
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_latency_sketch_is_within_its_accuracy(log_file, expected, engine):
+    sketch = LatencySketch(0.01)
+    log_data = read_log_file(log_file, engine=engine, latency_sketch=sketch)
+    assert log_data.latency_sketch is sketch
+    latencies = numpy.sort([latency for values in expected.latencies.values() for latency in values])
+    assert sketch.count == len(latencies)
+    assert log_data.total_pubs_per_second() == expected.total_pubs_per_second()
+    for quantile in (0, 0.01, 0.5, 0.9, 0.99, 1):
+        exact = latencies[int(quantile * (len(latencies) - 1))]
+        assert abs(sketch.quantile(quantile) - exact) <= 0.01 * abs(exact)
+
+    # Merging the sketches of two halves loses nothing
+    halves = LatencySketch(0.01), LatencySketch(0.01)
+    halves[0].add_many(latencies[::2])
+    for latency in latencies[1::2]:
+        halves[1].add(latency)
+    halves[0].merge(halves[1])
+    assert dict(halves[0].positive) == dict(sketch.positive)
+    assert (halves[0].count, halves[0].min, halves[0].max) == (sketch.count, sketch.min, sketch.max)
+
+
+def test_legacy_logs(tmp_path):
+    legacy_log = 'FULL_Method-4_Row-4_Col-1000_MS_INTER_SLOW-100_MS_INTER_FAST-0_Nodes_Pub_Fast-' \
+                 '0_RECENT_PUB-99999_RANDOM_PUB-10_S_STOP-0_DROP_RATE-4_MTU.log'
+    shutil.copyfile(os.path.join(REPO_DIR, 'exp_log_files', legacy_log), tmp_path / legacy_log)
+    shutil.copyfile(os.path.join(REPO_DIR, 'results', '10rand'), tmp_path / '10rand')
+    # Neither of these is a log
+    (tmp_path / 'analyze.py').write_text('')
+    (tmp_path / 'result.txt').write_text('')
+    logs = read_legacy_logs(str(tmp_path), workers=2, sidecar=False)
+    assert list(logs) == [str(tmp_path / '10rand'), str(tmp_path / legacy_log)]
+    parameters, log_data = logs[str(tmp_path / legacy_log)]
+    assert parameters['method'] == 'FULL' and parameters['drop_rate'] == 0 and parameters['mtu'] == 4
+    assert logs[str(tmp_path / '10rand')][0] == {'random_to_include': 10}
+    for filepath, (_, log_data) in logs.items():
+        assert_same_log_data(read_log_file(filepath, engine='python'), log_data)
+
+
+@pytest.mark.parametrize('engine, workers', [('python', 1), ('numpy', 1), ('numpy', 2), ('outofcore', 1)])
+def test_diagnostic_lines(tmp_path, expected, engine, workers):
+    with open(LOG_FILE) as hdl:
+        lines = hdl.read().split('\n')
+    # What a debug build of core.cpp prints in between the events
+    diagnostics = {
+        10: '(Entering suppression state)',
+        20: '/it,Found outdated entry /nl::3 but ignoring since within network RTT (12 ms out of date)',
+        30: '/ch,Found outdated entry /it::5 older than RTT (250 ms out of date)',
+    }
+    for position in sorted(diagnostics, reverse=True):
+        lines.insert(position, diagnostics[position])
+    filepath = tmp_path / 'base-debug'
+    filepath.write_text('\n'.join(lines))
+
+    log_data = read_log_file(str(filepath), engine=engine, workers=workers)
+    for field in SUMMARY_FIELDS:
+        assert getattr(log_data, field) == getattr(expected, field), field
+    for metric in SUMMARY_METRICS:
+        assert getattr(log_data, metric)() == getattr(expected, metric)(), metric
+
+    found = read_log_diagnostics(str(filepath), sidecar=False, workers=workers)
+    names = found['node_names']
+    assert len(found['suppression']) == 1
+    assert found['suppression'].times()[0] == float(lines[9].split(',')[0])
+    for kind, position, node, data_node, seq, delta_ms in (
+            ('outdated_ignored', 20, 'it', 'nl', 3, 12), ('outdated_accepted', 30, 'ch', 'it', 5, 250)):
+        table = found[kind]
+        assert len(table) == 1
+        assert (names[table.node[0]], names[table.data_node[0]], table.seq[0], table.delta_ms[0]) == \
+            (node, data_node, seq, delta_ms)
+        assert table.times()[0] == float(lines[position - 1].split(',')[0])
+
+
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_delivery_report(tmp_path, engine):
+    filepath = tmp_path / 'base-log'
+    filepath.write_text('0.000000,/a,PUB,/a::1\n'
+                        '10.000000,/b,RECV,/a::1\n'
+                        '100.000000,/b,PUB,/b::1\n'
+                        '110.000000,/a,RECV,/b::1\n'
+                        '120.000000,/c,RECV,/b::1\n'
+                        # Published too late for anyone to get it
+                        '500.000000,/a,PUB,/a::2\n'
+                        'SYNC_PACK=1\nSYNC_BYTE=1\nMTU_SIZE=3\n')
+    log_data = read_log_file(str(filepath), engine=engine)
+    # By default, the grace period is the largest latency (20 ms), which
+    # makes a::2 late and c not getting a::1 lost
+    report = log_data.delivery_report()
+    assert report[('b', 'a')] == {'published': 2, 'received': 1, 'late': 1, 'lost': 0}
+    assert report[('c', 'a')] == {'published': 2, 'received': 0, 'late': 1, 'lost': 1}
+    assert report[('a', 'b')] == report[('c', 'b')] == {'published': 1, 'received': 1, 'late': 0, 'lost': 0}
+    assert report[('a', 'c')] == report[('b', 'c')] == {'published': 0, 'received': 0, 'late': 0, 'lost': 0}
+    assert len(report) == 6
+    assert log_data.delivery_ratio() == 3 / 4
+    report = log_data.delivery_report(grace_ms=0)
+    assert report[('c', 'a')] == {'published': 2, 'received': 0, 'late': 0, 'lost': 2}
+    assert log_data.delivery_ratio(grace_ms=0) == 3 / 6
+
+
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_latency_matrix_and_tail_attribution(log_file, expected, engine):
+    log_data = read_log_file(log_file, engine=engine)
+    by_pair = {}
+    for receiver, by_publisher in expected.receive_times.items():
+        for publisher, seqs in by_publisher.items():
+            by_pair[(publisher, receiver)] = [timestamp - expected.publish_times[publisher][seq]
+                                              for seq, timestamp in seqs.items()]
+    matrix = log_data.latency_matrix()
+    ids = {name: i for i, name in enumerate(matrix['nodes'])}
+    assert int(matrix['count'].sum()) == sum(len(latencies) for latencies in by_pair.values())
+    for (publisher, receiver), latencies in by_pair.items():
+        row, column = ids[publisher], ids[receiver]
+        assert matrix['count'][row, column] == len(latencies)
+        assert (matrix['median'][row, column], matrix['p90'][row, column]) == \
+            tuple(numpy.percentile(latencies, [50, 90]))
+    # Pairs without any RECV, like a node and itself
+    empty = matrix['count'] == 0
+    assert numpy.all(numpy.isnan(matrix['median'][empty])) and numpy.all(numpy.diag(empty))
+
+    attribution = log_data.latency_tail_attribution()
+    threshold = attribution['threshold']
+    tail = {pair: sum(latency > threshold for latency in latencies) for pair, latencies in by_pair.items()}
+    assert threshold == numpy.percentile([latency for latencies in by_pair.values() for latency in latencies], 90)
+    assert {pair: count for pair, count, _, _ in attribution['pairs']} == \
+        {pair: count for pair, count in tail.items() if count}
+    counts = [count for _, count, _, _ in attribution['pairs']]
+    assert counts == sorted(counts, reverse=True)
+    for key in ('pairs', 'publishers', 'receivers'):
+        assert sum(share for _, _, share, _ in attribution[key]) == pytest.approx(1)
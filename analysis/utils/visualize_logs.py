@@ -3,9 +3,9 @@ matplotlib.rcParams['pdf.fonttype'] = 42
 matplotlib.rcParams['ps.fonttype'] = 42
 import matplotlib.pylab as plt
 import os
-import glob
 
-from analysis import LogData, read_log_file
+from analysis import (LogData, complete_logs, glob_logs, merge_latency_histograms, read_log_file,
+                      read_log_windows)
 
 def plot_line(points, label, marker, plotter=None):
     lists = sorted(points)
@@ -18,14 +18,26 @@ def plot_line(points, label, marker, plotter=None):
     else:
         plt.plot(x, y, label=label, marker=marker)
 
+# Set this to a fraction (e.g. 0.1) to preview a sweep quickly: every plot
+# then only processes the RECVs of that fraction of the messages, see the
+# `sample` argument of read_log_file.
+PREVIEW_SAMPLE = None
+
 cache = {}
-def get_log_data(filepath, ignore_cache=False, timespan=None) -> LogData:
+def get_log_data(filepath, ignore_cache=False, timespan=None, engine='lazy', sample=None) -> LogData:
     """
     Use this as a wrapper to cache LogData reads, to speed up the program.
+    By default the LogData is lazy, so plots that only need the trailer or the
+    interest counts never parse the whole log.
+    `sample` defaults to PREVIEW_SAMPLE; previews are cached separately from
+    the full reads.
     """
-    if ignore_cache or filepath not in cache:
-        cache[filepath] = read_log_file(filepath, timespan)
-    return cache[filepath]
+    if sample is None:
+        sample = PREVIEW_SAMPLE
+    key = (filepath, timespan, sample)
+    if ignore_cache or key not in cache:
+        cache[key] = read_log_file(filepath, timespan, engine, sample=sample)
+    return cache[key]
 
 def plot_versus_publications(experiment_dir, strategies, topology_label, graph_type):
     """
@@ -42,10 +54,8 @@ def plot_versus_publications(experiment_dir, strategies, topology_label, graph_t
     markers = ['o', '^', 'v', 's']
     for i, strategy in enumerate(strategies):
         points = []
-        for log in glob.glob(experiment_dir + f'{strategy}-*'):
+        for log in complete_logs(experiment_dir, f'{strategy}-*'):
             log_data = get_log_data(log)
-            if not log_data.complete():
-                continue
             if graph_type == 'bytes':
                 points.append((log_data.total_pubs_per_second(), log_data.sync_bytes))
             elif graph_type == 'packets':
@@ -81,10 +91,8 @@ def plot_versus_latency(experiment_dir, strategies, topology_label, graph_type):
     markers = ['o', '^', 'v', 's']
     for i, strategy in enumerate(strategies):
         points = []
-        for log in glob.glob(experiment_dir + f'{strategy}-*'):
+        for log in complete_logs(experiment_dir, f'{strategy}-*'):
             log_data = get_log_data(log)
-            if not log_data.complete():
-                continue
             if graph_type == 'bytes':
                 points.append((log_data.latency_percentile_averages()[1], log_data.sync_bytes))
             if graph_type == 'packets':
@@ -111,10 +119,8 @@ def plot_latency_vs_mtu(experiment_dir, topology_label):
     markers = ['o', '^', 'v', 's']
     for i, strategy in enumerate(strategies):
         points = []
-        for log in glob.glob(experiment_dir + f'{strategy}-*'):
+        for log in complete_logs(experiment_dir, f'{strategy}-*'):
             log_data = get_log_data(log)
-            if not log_data.complete():
-                continue
             points.append((log_data.mtu_size / len(log_data.nodes) * 100, log_data.latency_percentile_averages()[1]))
         plot_line(points, label=f'{topology_label}, {strategy}', marker=markers[i])
 
@@ -138,10 +144,8 @@ def plot_byte_overhead_vs_mtu(experiment_dir, topology_label):
     markers = ['o', '^', 'v', 's']
     for i, strategy in enumerate(strategies):
         points = []
-        for log in glob.glob(experiment_dir + f'{strategy}-*'):
+        for log in complete_logs(experiment_dir, f'{strategy}-*'):
             log_data = get_log_data(log)
-            if not log_data.complete():
-                continue
             points.append((log_data.mtu_size / len(log_data.nodes) * 100, log_data.sync_bytes))
         plot_line(points, label=f'{topology_label}, {strategy}', marker=markers[i])
 
@@ -166,10 +170,8 @@ def plot_packet_overhead_vs_mtu(experiment_dir, topology_label):
     markers = ['o', '^', 'v', 's']
     for i, strategy in enumerate(strategies):
         points = []
-        for log in glob.glob(experiment_dir + f'{strategy}-*'):
+        for log in complete_logs(experiment_dir, f'{strategy}-*'):
             log_data = get_log_data(log)
-            if not log_data.complete():
-                continue
             points.append((log_data.mtu_size / len(log_data.nodes) * 100, log_data.sync_pack))
         plot_line(points, label=f'{topology_label}, {strategy}', marker=markers[i])
 
@@ -193,7 +195,7 @@ def plot_random_recent_tradeoff(experiment_dir, topology_label):
     xticks = []
     show_every_nth_tick = 1
 
-    for log in glob.glob(experiment_dir + f'randrec-*'):
+    for log in glob_logs(experiment_dir + f'randrec-*'):
         n_random, n_recent = [int(x) for x in log.split('/')[-1].split('-')[2:4]]
         ratio = n_recent
         xticks.append((ratio, f'{n_random}:{n_recent}'))
@@ -225,12 +227,10 @@ def plot_latency_vs_sim_length(experiment_dir, topology_label):
     markers = ['o', '^', 'v', 's']
     for i, strategy in enumerate(strategies):
         points = []
-        for log in glob.glob(experiment_dir + f'{strategy}-*'):
+        for log in complete_logs(experiment_dir, f'{strategy}-*'):
             log_data = get_log_data(log)
             # only works if drop rate 0.5, sry this is a quick hack. replace w/ your drop rate if this changes
             sim_length = int(log.split('-0.5')[0].split('-')[-1])
-            if not log_data.complete():
-                continue
             points.append((sim_length, log_data.latency_percentile_averages()[2]))
         plot_line(points, label=f'{topology_label}, {strategy}', marker=markers[i])
 
@@ -255,13 +255,13 @@ def plot_latency_vs_sim_length_single_file(
     Just some really quick sanity checking to make sure that the stop time doesn't affect latency nonlinearly
     """
     max_sim_length = get_log_data(dir + filename, True).end_time
+    sim_lengths = [(i/(num_points-1)) * max_sim_length + 10000 for i in range(num_points)]
 
     fig = matplotlib.pyplot.gcf()
     points = []
-    for i in range(num_points):
-        sim_length = (i/(num_points-1)) * max_sim_length + 10000
+    # One pass over the log for all of the cutoffs
+    for sim_length, log_data in zip(sim_lengths, read_log_windows(dir + filename, sim_lengths)):
         print(sim_length)
-        log_data = get_log_data(dir + filename, True, (0, sim_length))
         points.append((sim_length, log_data.latency_percentile_averages()[2]))
     plot_line(points, label=f'{label}', marker='o')
 
@@ -279,7 +279,7 @@ def plot_connectivity_vs_latency(experiment_dir, topology_label, drop_rates, tit
     markers = ['o', '^', 'v', 's', '*']
     for i, drop_rate in enumerate(drop_rates):
         points = []
-        logs = glob.glob(experiment_dir + f'*-{drop_rate}')
+        logs = glob_logs(experiment_dir + f'*-{drop_rate}')
         for log in logs:
             if 'large_' in log:
                 # hack
@@ -307,7 +307,7 @@ def plot_hop_count_vs_latency(experiment_dir, topology_label, drop_rates, title,
     markers = ['o', '^', 'v', 's', '*']
     for i, drop_rate in enumerate(drop_rates):
         points = []
-        logs = glob.glob(experiment_dir + f'*-{drop_rate}')
+        logs = glob_logs(experiment_dir + f'*-{drop_rate}')
         for log in logs:
             if 'large_' in log:
                 # hack
@@ -391,7 +391,7 @@ def plot_connectivity_vs_packets(experiment_dir, topology_label, drop_rates, tit
     markers = ['o', '^', 'v', 's', '*']
     for i, drop_rate in enumerate(drop_rates):
         points = []
-        logs = glob.glob(experiment_dir + f'*-{drop_rate}')
+        logs = glob_logs(experiment_dir + f'*-{drop_rate}')
         for log in logs:
             if 'large_' in log:
                 # hack
@@ -434,7 +434,7 @@ def plot_drop_rate_vs_latency(experiment_dir, topology_label):
     drop_rates = [0] + [i/20 for i in range(1, 21)]
     points = []
     for i, drop_rate in enumerate(drop_rates):
-        logs = glob.glob(experiment_dir + f'base-geant_small_*-{drop_rate}')
+        logs = glob_logs(experiment_dir + f'base-geant_small_*-{drop_rate}')
         if not logs:
             continue
         log = logs[0]
@@ -469,9 +469,9 @@ def run_full_xiao_plots(experiment_dir, topology_label):
 def plot_exp_latency_decrease(timer, drop_rate, title, ylim=None, no_legend=True, ax = None):
     markers = ['o', 'v', '*']
     points = []
-    logs = glob.glob(f'/home/developer/scenario-svs-217b/analysis/logs/geant_large_week_8_{timer}/' + f'*-{drop_rate}')
-    logs_upgraded = glob.glob(f'/home/developer/scenario-svs-217b/analysis/logs/upgraded_geant_large_week_8_{timer}/' + f'*-{drop_rate}')
-    logs_upgraded3 = glob.glob(f'/home/developer/scenario-svs-217b/analysis/logs/upgraded3_geant_large_week_8_{timer}/' + f'*-{drop_rate}')
+    logs = glob_logs(f'/home/developer/scenario-svs-217b/analysis/logs/geant_large_week_8_{timer}/' + f'*-{drop_rate}')
+    logs_upgraded = glob_logs(f'/home/developer/scenario-svs-217b/analysis/logs/upgraded_geant_large_week_8_{timer}/' + f'*-{drop_rate}')
+    logs_upgraded3 = glob_logs(f'/home/developer/scenario-svs-217b/analysis/logs/upgraded3_geant_large_week_8_{timer}/' + f'*-{drop_rate}')
     for j in range(len(logs)):
         average_degree = 2 * int(str(logs[j]).split('large_')[2].split('-')[0]) / 45
         log_data = get_log_data(logs[j])
@@ -502,9 +502,9 @@ def plot_exp_latency_decrease(timer, drop_rate, title, ylim=None, no_legend=True
 def plot_exp_count_decrease(timer, drop_rate, title, ylim=None, no_legend=True, ax = None):
     markers = ['o', 'v', '*']
     points = []
-    logs = glob.glob(f'/home/developer/scenario-svs-217b/analysis/logs/geant_large_week_8_{timer}/' + f'*-{drop_rate}')
-    logs_upgraded = glob.glob(f'/home/developer/scenario-svs-217b/analysis/logs/upgraded_geant_large_week_8_{timer}/' + f'*-{drop_rate}')
-    logs_upgraded3 = glob.glob(f'/home/developer/scenario-svs-217b/analysis/logs/upgraded3_geant_large_week_8_{timer}/' + f'*-{drop_rate}')
+    logs = glob_logs(f'/home/developer/scenario-svs-217b/analysis/logs/geant_large_week_8_{timer}/' + f'*-{drop_rate}')
+    logs_upgraded = glob_logs(f'/home/developer/scenario-svs-217b/analysis/logs/upgraded_geant_large_week_8_{timer}/' + f'*-{drop_rate}')
+    logs_upgraded3 = glob_logs(f'/home/developer/scenario-svs-217b/analysis/logs/upgraded3_geant_large_week_8_{timer}/' + f'*-{drop_rate}')
     for j in range(len(logs)):
         average_degree = 2 * int(str(logs[j]).split('large_')[2].split('-')[0]) / 45
         log_data = get_log_data(logs[j])
@@ -530,6 +530,53 @@ def plot_exp_count_decrease(timer, drop_rate, title, ylim=None, no_legend=True,
         ax.set_ylim(ylim)
     return ax
 
+def plot_exp_latency_cdf(timer, drop_rate, title, no_legend=True, ax=None):
+    """
+    Compare the latency distribution of the uniform timer, exponential timer
+    and RTT optimization variants. Every variant merges the stored latency
+    histograms of all of its runs, so the raw logs are only read the first
+    time.
+    """
+    variants = [
+        ('', 'Uniform suppression timer'),
+        ('upgraded_', 'Exponential suppression timer'),
+        ('upgraded3_', 'Exp. timer and RTT optimization'),
+    ]
+    plotter = ax if ax else plt
+    for prefix, label in variants:
+        logs = complete_logs(f'/home/developer/scenario-svs-217b/analysis/logs/{prefix}geant_large_week_8_{timer}/', f'*-{drop_rate}')
+        if not logs:
+            print(f'Warning: label "{label}" was empty! Is this correct?')
+            continue
+        latencies, fractions = merge_latency_histograms(logs).cdf()
+        plotter.step(latencies, fractions, where='post', label=label)
+    if ax:
+        ax.set_xscale('log')
+        ax.grid()
+        ax.set_title(title)
+    if not no_legend:
+        plotter.legend(loc='upper center', bbox_to_anchor=(0.5, -0.30), ncol=2)
+    return ax
+
+def plot_interest_rate(log, title, bucket_ms=1000, no_legend=True, ax=None):
+    """
+    Plot the rate of every type of sync interest over the course of a run, to
+    see e.g. whether the exponential suppression timer shifts load over time.
+    The counts come from the same read of the log as everything else.
+    """
+    series = get_log_data(log).interest_time_series(bucket_ms)
+    plotter = ax if ax else plt
+    seconds = series['bucket_starts'] / 1000
+    for interest_type in ['PUBLISH', 'SUPPRESSION', 'PERIODIC']:
+        plotter.step(seconds, series[interest_type] / (bucket_ms / 1000), where='post',
+                     label=interest_type.capitalize())
+    if ax:
+        ax.grid()
+        ax.set_title(title)
+    if not no_legend:
+        plotter.legend(loc='upper center', bbox_to_anchor=(0.5, -0.30), ncol=3)
+    return ax
+
 if __name__ == '__main__':
     # fig, axs = plt.subplots(nrows=3, ncols=1)
     # plt.subplots_adjust(hspace=0.4, wspace=0.3, top=0.9, bottom=0.155)
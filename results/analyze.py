@@ -1,31 +1,47 @@
+import os
 import sys
 
-def average_delay_for_node(node_of_interest,log_file):
-    publications = {}
-    latencies = []
-    max_time = 0
-    with open(log_file, 'r') as f:
-        for line in f:
-            line = [x.strip() for x in line.split(',')]
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analysis', 'utils'))
+from analysis import read_log_file
+
+def _node_name(node):
+    """
+    Node names are logged with a leading slash (`/0-1`, `/it`), but are often
+    typed without it; accept both.
+    """
+    return node if node.startswith('/') else '/' + node
 
-            time = float(line[0])
-            node = line[1]
-            mtype = line[2]
-            mid = line[3]
+def node_delay_report(log_file, percentiles=(50, 90, 99)):
+    """
+    Parse the log once and report the receive delay of every node that
+    received anything: a dict from the node name to its number of RECVs,
+    average delay and the delay at each of the `percentiles` (as 'p50' etc.).
+    """
+    report = read_log_file(log_file, engine='numpy').node_delay_report(tuple(percentiles))
+    return {_node_name(node): row for node, row in report.items()}
 
-            if mtype == 'PUB':
-                publications[mid] = time
-            if node != node_of_interest:
-                continue
-            if mtype == 'RECV':
-                latencies.append(time - publications[mid])
+def print_node_delay_report(report):
+    columns = list(next(iter(report.values()), {}))
+    print('node'.ljust(12) + ''.join(column.rjust(12) for column in columns))
+    for node, row in sorted(report.items()):
+        print(node.ljust(12) + ''.join(f'{row[column]:12.2f}' if column != 'count' else f'{row[column]:12d}'
+                                       for column in columns))
 
-            max_time = max(max_time, time)
-        print(f"Average delay for node 0-0: {sum(latencies)/len(latencies)}")
+def average_delay_for_node(node_of_interest,log_file):
+    # This parses the whole log, so to look at many nodes use
+    # node_delay_report once instead of calling this for every node
+    node_of_interest = _node_name(node_of_interest)
+    row = node_delay_report(log_file).get(node_of_interest)
+    if row is None:
+        print(f"Node {node_of_interest} received nothing")
+        return None
+    print(f"Average delay for node {node_of_interest}: {row['average']}")
+    return row['average']
 
 if __name__ == "__main__":
     log_file = sys.argv[1]
-    node_name = sys.argv[2]
     print("Processing", log_file)
-    average_delay_for_node(node_name, log_file)
-
+    if len(sys.argv) > 2:
+        average_delay_for_node(sys.argv[2], log_file)
+    else:
+        print_node_delay_report(node_delay_report(log_file))